@@ -1,21 +1,33 @@
-import matplotlib
-matplotlib.use("Agg")   # 🔥 CRITICAL FIX for Flask + EXE + headless mode
-
-import os, zipfile, shutil, sys
+import os, zipfile, sys, shutil, time, threading, importlib
+import multiprocessing
 from pathlib import Path
-from flask import Flask, render_template, request, redirect, url_for, flash, send_file
-import pandas as pd
-import requests
-import base64
-from io import BytesIO
-import matplotlib.pyplot as plt
-
-from grader import grade_folder, CRITERIA_MAP, get_local_explanation
-from excel_export import make_excel_from_df
+from flask import Flask, render_template, request, redirect, url_for, flash, send_from_directory, jsonify, g, Response
+
+from grader import grade_zip_incremental, grade_all_modules, apply_execution_scores, load_sources, ZipLimitError, CRITERIA_MAP, get_local_explanation, scoring_version
+from charts import chart_data, render_svg_charts
+from score_cache import ScoreCache
+from jobs import submit_job, get_job, read_status, running_job_ids, status_running
+from explain_client import ExplainClient
+from runs import save_run, load_run, load_meta, load_table, query_rows, load_timings, run_exists, run_dir
+from manifest import manifest_path, manifest_lock, load_manifest, save_manifest
+from workspace import create_workspace, cleanup_workspaces
+import rubrics
+import sandbox
+from similarity import SimilarityIndex, find_similar
+from history import GradeHistory
+import budget
+import columnar
+import chunked_upload
+from chunked_upload import UploadConflict, UploadError, UploadTooLarge
+import timing
+from timing import stage, Timings
 
 app = Flask(__name__)
 app.secret_key = "m7pro-flask-secret-2025"
 
+# Plain form uploads get the same size limit as chunked ones (plus room for the solution file)
+app.config["MAX_CONTENT_LENGTH"] = chunked_upload.MAX_UPLOAD_BYTES + 16 * 1024 * 1024
+
 # 🔥 FIX FOR EXE: Use user's home directory instead of temp folder
 if getattr(sys, 'frozen', False):
     # Running as EXE - use a permanent location
@@ -26,27 +38,152 @@ else:
 
 UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
 
-DICT_API_URL = "http://127.0.0.1:8000/explain/"
+# Instructors' own rubric files (new modules, changed weights) override the
+# built-in rubrics/ folder; inside the EXE that folder can't be edited
+if getattr(sys, 'frozen', False):
+    rubrics.add_dir(UPLOAD_DIR.parent / "rubrics")
+
+# Every upload gets its own workspace here, named by its run id (see workspace.py)
+# The uploaded files, the job status and the stored results all live in it
+RUNS_DIR = UPLOAD_DIR / "runs"
+
+# Job progress mirrored to disk so any worker process can report on it
+STATUS_FILE = "status.json"
+
+# One manifest per course + module for incremental regrading (see manifest.py)
+MANIFEST_DIR = UPLOAD_DIR / "manifests"
+
+DICT_API_URL = "http://127.0.0.1:8000/explain"
+
+# Pooled, memoized explanation lookups; falls back to local text when the API is down
+EXPLAINER = ExplainClient(DICT_API_URL, fallback=get_local_explanation)
+
+# pandas, numpy, openpyxl and requests are only imported when a grading run
+# needs them, so the first page shows up fast. With warm-up on they are
+# loaded in a background thread right after the first page is served, so the
+# first upload doesn't wait for them either (M7PRO_WARMUP=0 turns this off)
+# matplotlib is left out on purpose - only Excel downloads need it
+WARMUP = os.environ.get("M7PRO_WARMUP", "1") != "0"
+WARMUP_MODULES = ("pandas", "numpy", "openpyxl", "excel_export", "requests")
+_warmup_lock = threading.Lock()
+_warmup_started = False
+
+# Worker processes used to grade a ZIP (1 = grade serially, 0 = one per CPU)
+GRADER_WORKERS = int(os.environ.get("M7PRO_GRADER_WORKERS", "0")) or None
+
+# Run submissions against the uploaded solution to grade "output" (1 = on)
+# Off by default: the sandbox stops mistakes, not hostile code, so only turn
+# it on when the grader itself runs isolated (container / VM, no network)
+EXECUTION_ENABLED = os.environ.get("M7PRO_EXECUTION", "0") == "1" and sandbox.available()
 
-# Module display names
-MODULE_NAMES = {
-    "M1": "M1 - Input Output",
-    "M2": "M2 - Collections (List, Dictionaries)",
-    "M3": "M3 - Decision Structures",
-    "M4": "M4 - Loops",
-    "M5": "M5 - Functions"
-}
+# Scores survive restarts, so re-uploading the same ZIP skips rescoring
+SCORE_CACHE = ScoreCache(UPLOAD_DIR / "score_cache.sqlite3")
+
+# Signatures of past submissions, for near-duplicate checks across runs
+SIMILARITY_INDEX = SimilarityIndex(UPLOAD_DIR / "similarity.sqlite3")
+
+# Every graded submission, for progress and trends across runs (/history)
+HISTORY = GradeHistory(UPLOAD_DIR / "history.sqlite3")
+
+# Excel files are built on first download, one at a time
+EXCEL_LOCK = threading.Lock()
+
+# Rows per page of /api/runs/<id>/results (the page asks for PAGE_SIZE)
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+# Module display names, from the rubric files
+MODULE_NAMES = rubrics.MODULE_NAMES
+
+# Upload option that scores the ZIP against every module's rubric at once
+ALL_MODULES = "ALL"
+ALL_MODULES_NAME = "All Modules - Rubric Comparison"
+
+
+def module_name(module):
+    """Display name of a module (or of the all-modules comparison)"""
+    if module == ALL_MODULES:
+        return ALL_MODULES_NAME
+    return MODULE_NAMES.get(module, module)
 
 
 def try_explain(criterion):
     """Try external API → fallback to local explanation."""
-    try:
-        r = requests.get(DICT_API_URL + criterion, timeout=1.2)
-        if r.status_code == 200:
-            return r.json()["explanation"]
-    except:
-        pass
-    return get_local_explanation(criterion)
+    return EXPLAINER.explain(criterion)
+
+
+@app.before_request
+def _refresh_rubrics():
+    # Edited rubric files take effect on the next request, no restart needed
+    rubrics.refresh()
+
+
+@app.before_request
+def _start_timing():
+    # Every stage timed while handling the request is also collected here
+    if timing.ENABLED:
+        g.timings = Timings()
+        g.timing_token = timing.activate(g.timings)
+        g.request_start = time.perf_counter()
+
+
+@app.teardown_request
+def _stop_timing(exc=None):
+    token = g.pop("timing_token", None)
+    if token is not None:
+        timing.deactivate(token)
+
+
+@app.after_request
+def _server_timing(response):
+    """Server-Timing header on /results: this request's stages, plus the stored run's"""
+    if request.endpoint == "results" and "timings" in g:
+        parts = [g.timings.server_timing(),
+                 f"total;dur={(time.perf_counter() - g.request_start) * 1000:.1f}"]
+        run_id = g.get("run_id")
+        if run_id:
+            parts += [f"run-{name};dur={t['seconds'] * 1000:.1f}"
+                      for name, t in load_timings(RUNS_DIR, run_id).items()]
+        response.headers["Server-Timing"] = ", ".join(p for p in parts if p)
+    return response
+
+
+def _warm_up():
+    for name in WARMUP_MODULES:
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            pass
+
+
+@app.after_request
+def _start_warmup(response):
+    """After the first response is sent, load the heavy modules in the background"""
+    global _warmup_started
+    if WARMUP and not _warmup_started:
+        with _warmup_lock:
+            if not _warmup_started:
+                _warmup_started = True
+                response.call_on_close(
+                    lambda: threading.Thread(target=_warm_up, name="m7pro-warmup", daemon=True).start())
+    return response
+
+
+def _with_timings(func, timings):
+    """Run a job with the upload request's Timings active, so its stages are stored with the run"""
+    def run(job, *args):
+        with timing.collect(timings):
+            return func(job, *args)
+    return run
+
+
+@app.errorhandler(413)
+def _too_large(e):
+    message = f"📦 Uploads may be at most {chunked_upload.MAX_UPLOAD_BYTES // 1024 ** 2} MB"
+    if request.path.startswith("/api/"):
+        return _api_error(message, 413)
+    flash(message)
+    return redirect(url_for("upload"))
 
 
 @app.route("/")
@@ -58,10 +195,12 @@ def index():
 def upload():
     if request.method == "POST":
         module = request.form.get("module")
+        course = request.form.get("course", "").strip() or "default"
+        fixtures = sandbox.parse_fixtures(request.form.get("fixtures", ""))
         sol = request.files.get("solution_file")
         zip_file = request.files.get("submissions_zip")
 
-        if module not in CRITERIA_MAP:
+        if module not in CRITERIA_MAP and module != ALL_MODULES:
             flash("❌ Invalid module selection")
             return redirect(request.url)
 
@@ -69,140 +208,535 @@ def upload():
             flash("📁 Please upload a submissions ZIP file")
             return redirect(request.url)
 
-        # Save solution (optional)
-        solution_path = None
-        if sol and sol.filename:
-            solution_path = UPLOAD_DIR / f"solution{Path(sol.filename).suffix}"
-            sol.save(solution_path)
-
-        # Save ZIP
-        zip_path = UPLOAD_DIR / "submissions.zip"
-        zip_file.save(zip_path)
-
-        # Extract ZIP
-        extract_dir = UPLOAD_DIR / "extracted"
-        if extract_dir.exists():
-            shutil.rmtree(extract_dir)
-        extract_dir.mkdir()
+        # Drop old runs before adding a new one (never the ones still grading or uploading)
+        _cleanup_runs()
 
-        with zipfile.ZipFile(zip_path, "r") as z:
-            z.extractall(extract_dir)
-
-        flash(f"✅ Successfully uploaded and extracted files for {MODULE_NAMES[module]}")
-        return redirect(url_for("results", module=module))
-
-    return render_template("upload.html", modules=CRITERIA_MAP.keys(), module_names=MODULE_NAMES)
+        # Private folder for this upload - concurrent uploads never share files
+        run_id, workspace = create_workspace(RUNS_DIR)
 
+        # Save solution (optional)
+        with stage("upload"):
+            solution_path = None
+            if sol and sol.filename:
+                solution_path = workspace / f"solution{Path(sol.filename).suffix}"
+                sol.save(solution_path)
+
+            # Save ZIP - it is graded straight from the archive, nothing is extracted
+            zip_path = workspace / "submissions.zip"
+            zip_file.save(zip_path)
+
+        if not zipfile.is_zipfile(zip_path):
+            shutil.rmtree(workspace, ignore_errors=True)
+            flash("❌ The uploaded file is not a valid ZIP archive")
+            return redirect(request.url)
 
-@app.route("/results")
-def results():
-    module = request.args.get("module")
+        job = _start_grading(run_id, workspace, zip_path, module, course, solution_path, fixtures)
+        flash(f"✅ Successfully uploaded files for {module_name(module)}")
+        return redirect(url_for("results", job=job.id))
+
+    if rubrics.last_error:
+        flash(f"⚠️ Rubric files not reloaded: {rubrics.last_error}")
+    return render_template("upload.html", modules=CRITERIA_MAP.keys(),
+                           module_names={**MODULE_NAMES, ALL_MODULES: ALL_MODULES_NAME},
+                           execution_enabled=EXECUTION_ENABLED)
+
+
+def _workspace_busy(path):
+    """A job queued or running, or an upload still arriving - in any worker process"""
+    return status_running(path / STATUS_FILE) or chunked_upload.pending(path)
+
+
+def _cleanup_runs():
+    cleanup_workspaces(RUNS_DIR, keep=running_job_ids(), busy=_workspace_busy)
+
+
+def _removing_zip(func):
+    """
+    Run a job, then delete the ZIP it graded - the results are stored, and
+    a kept ZIP would count against the runs folder's disk budget
+    """
+    def run(job, zip_path, *args):
+        try:
+            return func(job, zip_path, *args)
+        finally:
+            Path(zip_path).unlink(missing_ok=True)
+    return run
+
+
+def _start_grading(run_id, workspace, zip_path, module, course, solution_path, fixtures):
+    """Submit the grading job for an uploaded ZIP in its run workspace; returns the job"""
+    status_path = workspace / STATUS_FILE
+    run_timings = g.get("timings") or Timings()
+    if module == ALL_MODULES:
+        return submit_job(module, _with_timings(_removing_zip(_compare_job), run_timings), zip_path,
+                          job_id=run_id, status_path=status_path)
+    return submit_job(module, _with_timings(_removing_zip(_grade_job), run_timings),
+                      zip_path, module, course, solution_path, fixtures,
+                      job_id=run_id, status_path=status_path)
+
+
+def _grade_job(job, zip_path, module, course="default", solution_path=None, fixtures=None):
+    """
+    Full grading pipeline - runs in the background job executor
+    Only files that changed since the course's last upload are rescored
+    With a .py solution, "output" is graded by running every submission
+    in the sandbox and comparing what it prints with the solution
+    Everything is stored as a run under RUNS_DIR; returns the run id
+    """
     criteria = CRITERIA_MAP[module]
 
-    extract_dir = UPLOAD_DIR / "extracted"
-    df, feedback = grade_folder(str(extract_dir), criteria)
-
-    # Add explanation text
+    path = manifest_path(MANIFEST_DIR, course, module)
+    with manifest_lock(path):
+        with stage("manifest"):
+            manifest = load_manifest(path, criteria, scoring_version(criteria))
+        try:
+            df, feedback, changes = grade_zip_incremental(
+                zip_path, criteria, manifest, workers=GRADER_WORKERS,
+                cache=SCORE_CACHE, progress=job.progress)
+        except ZipLimitError as e:
+            raise ValueError(f"🚫 ZIP rejected: {e}") from e
+        with stage("manifest"):
+            save_manifest(path, manifest)
+
+    # Execution-based output grading (the manifest keeps the static scores)
+    execution = {"mode": "static"}
+    if solution_path is not None and solution_path.suffix == ".py" and EXECUTION_ENABLED:
+        execution = apply_execution_scores(
+            zip_path, df, feedback, criteria, solution_path.read_text(encoding="utf-8", errors="replace"),
+            fixtures or sandbox.DEFAULT_FIXTURES, sandbox.get_pool(), progress=job.progress)
+
+    # Near-duplicate submissions, in this ZIP and against earlier runs
+    # A report that can't be made must not cost the run its grades
+    with stage("similarity"):
+        try:
+            similar = find_similar(load_sources(zip_path), course, module, job.id, SIMILARITY_INDEX)
+        except Exception as e:
+            similar = {"error": type(e).__name__, "pairs": []}
+
+    # Add explanation text - every missing key is looked up in one request
+    missing = [crit for fb in feedback for crit in criteria if crit not in fb["feedback"]]
+    with stage("explain"):
+        explanations = EXPLAINER.explain_many(missing)
     for fb in feedback:
         for crit in criteria.keys():
             if crit not in fb["feedback"]:
-                fb["feedback"][crit] = try_explain(crit)
+                fb["feedback"][crit] = explanations[crit]
 
-    # === Create CSV + Excel ===
+    # === Create CSV (the Excel file is built the first time it is downloaded) ===
     csv_filename = f"M7Pro_{module}_grades.csv"
     excel_filename = f"M7Pro_{module}_grades.xlsx"
 
-    df.to_csv(UPLOAD_DIR / csv_filename, index=False)
-    excel_bytes = make_excel_from_df(df, module, feedback)
-    with open(UPLOAD_DIR / excel_filename, "wb") as f:
-        f.write(excel_bytes)
-
-    # ========== Matplotlib Charts (Base64 Embedded) ==========
-    crit_cols = [c for c in df.columns if c not in ["file", "total_grade"]]
-
-    plt.style.use('seaborn-v0_8-darkgrid')
-    
-    # 1 – CHART 1: Bar chart plotting criteria (average scores)
-    plot_criteria = None
-    if crit_cols:
-        img = BytesIO()
-        fig, ax = plt.subplots(figsize=(10, 5))
-        colors = ['#4CAF50', '#2196F3', '#FF9800', '#9C27B0', '#F44336']
-        df[crit_cols].mean().plot(kind="bar", color=colors[:len(crit_cols)], ax=ax, edgecolor='black', linewidth=1.2)
-        ax.set_title("Average Score by Criteria", fontsize=16, fontweight='bold', pad=20)
-        ax.set_ylabel("Weighted Score (0–100)", fontsize=12)
-        ax.set_xlabel("Criteria", fontsize=12)
-        ax.tick_params(axis='x', rotation=45)
-        ax.grid(axis='y', alpha=0.3)
-        plt.tight_layout()
-        plt.savefig(img, format="png", dpi=100, facecolor='white')
-        plt.close()
-        img.seek(0)
-        plot_criteria = base64.b64encode(img.getvalue()).decode()
-
-    # 2 – CHART 2: Bar chart showing students with grade 1 vs other grades
+    folder = run_dir(RUNS_DIR, job.id)
+    folder.mkdir(parents=True, exist_ok=True)
+
+    with stage("csv"):
+        df.to_csv(folder / csv_filename, index=False)
+
     grade_1_count = (df["total_grade"] == 1).sum()
-    other_count = len(df) - grade_1_count
-    total_students = len(df)
-    
-    grade_1_pct = (grade_1_count / total_students * 100) if total_students > 0 else 0
-    other_pct = (other_count / total_students * 100) if total_students > 0 else 0
-    
-    img2 = BytesIO()
-    fig, ax = plt.subplots(figsize=(10, 5))
-    categories = ['Grade = 1\n(Failed)', 'Other Grades\n(Passed)']
-    counts = [grade_1_count, other_count]
-    colors_bar = ['#ef4444', '#10b981']
-    
-    bars = ax.bar(categories, counts, color=colors_bar, edgecolor='black', linewidth=1.2, alpha=0.8)
-    
-    # Add count and percentage labels on bars
-    for bar, count, pct in zip(bars, counts, [grade_1_pct, other_pct]):
-        height = bar.get_height()
-        ax.text(bar.get_x() + bar.get_width()/2., height,
-                f'{count} students\n({pct:.1f}%)',
-                ha='center', va='bottom', fontsize=10, fontweight='bold')
-    
-    ax.set_title("Students with Grade 1 vs Other Grades", fontsize=16, fontweight='bold', pad=20)
-    ax.set_ylabel("Number of Students", fontsize=12)
-    ax.grid(axis='y', alpha=0.3)
-    plt.tight_layout()
-    plt.savefig(img2, format="png", dpi=100, facecolor='white')
-    plt.close()
-    img2.seek(0)
-    plot_grade1 = base64.b64encode(img2.getvalue()).decode()
-
-    # 3 - Summary Statistics
+
+    # 3 - Summary Statistics (plain Python numbers so they can be stored as JSON)
     stats = {
         'total_submissions': len(df),
-        'average_grade': round(df['total_grade'].mean(), 2),
-        'highest_grade': round(df['total_grade'].max(), 2),
-        'lowest_grade': round(df['total_grade'].min(), 2),
-        'passing_rate': round((df['total_grade'] >= 70).sum() / len(df) * 100, 1) if len(df) > 0 else 0,
-        'grade_1_count': grade_1_count  # Add this for the stat card
+        'average_grade': float(round(df['total_grade'].mean(), 2)),
+        'highest_grade': float(round(df['total_grade'].max(), 2)),
+        'lowest_grade': float(round(df['total_grade'].min(), 2)),
+        'passing_rate': float(round((df['total_grade'] >= 70).sum() / len(df) * 100, 1)) if len(df) > 0 else 0,
+        'grade_1_count': int(grade_1_count)  # Add this for the stat card
     }
 
-    return render_template(
-        "results.html",
+    meta = dict(
         module=module,
-        module_name=MODULE_NAMES[module],
-        df=df,
-        feedback=feedback,
+        module_name=module_name(module),
+        course=course,
+        changes=changes,
+        weights=dict(criteria),
+        execution=execution,
+        budget=budget.summarize(feedback),
+        similarity=similar,
+        chart_data=chart_data(df),
         csv_filename=csv_filename,
         excel_filename=excel_filename,
-        plot_criteria=plot_criteria,  # FIXED: was plot_avg
-        plot_grade1=plot_grade1,      # FIXED: was plot_hist
+        parquet_filename=columnar.parquet_filename(module) if columnar.available() else None,
         stats=stats
     )
+    save_run(RUNS_DIR, job.id, df, feedback, meta, timing.current())
+    with stage("history"):
+        HISTORY.add_run(job.id, course, module, criteria,
+                        [{**row, "failed": fb.get("failed", False)}
+                         for row, fb in zip(df.to_dict(orient="records"), feedback)])
+    return job.id
+
+
+def _compare_job(job, zip_path):
+    """
+    Score the ZIP against every module's rubric in one pass
+    Stored as a run like _grade_job; returns the run id
+    """
+    try:
+        df = grade_all_modules(zip_path, workers=GRADER_WORKERS, progress=job.progress)
+    except ZipLimitError as e:
+        raise ValueError(f"🚫 ZIP rejected: {e}") from e
+
+    folder = run_dir(RUNS_DIR, job.id)
+    folder.mkdir(parents=True, exist_ok=True)
+    csv_filename = "M7Pro_all_modules_grades.csv"
+    with stage("csv"):
+        df.to_csv(folder / csv_filename, index=False)
+
+    # Per-module summary cards
+    module_stats = []
+    for m in CRITERIA_MAP:
+        col = df[m]
+        module_stats.append({
+            'module': m,
+            'name': module_name(m),
+            'average_grade': float(round(col.mean(), 2)) if len(df) else 0,
+            'passing_rate': float(round((col >= 70).sum() / len(df) * 100, 1)) if len(df) else 0,
+            'grade_1_count': int((col == 1).sum()),
+        })
+
+    meta = dict(
+        kind="compare",
+        module=ALL_MODULES,
+        module_name=ALL_MODULES_NAME,
+        modules=list(CRITERIA_MAP),
+        csv_filename=csv_filename,
+        parquet_filename=columnar.parquet_filename("all_modules") if columnar.available() else None,
+        module_stats=module_stats
+    )
+    save_run(RUNS_DIR, job.id, df, [], meta, timing.current())
+    return job.id
+
+
+@app.route("/results")
+def results():
+    # Stored runs are just read back from disk - nothing is regraded
+    run_id = request.args.get("run")
+    if run_id:
+        with stage("load_run"):
+            context = load_meta(RUNS_DIR, run_id)
+            # Comparison runs, and runs saved before chart data was stored, need the table itself
+            if context is not None and (context.get("kind") == "compare" or not context.get("chart_data")):
+                context = load_run(RUNS_DIR, run_id)
+        if context is None:
+            flash("❌ Grading run not found")
+            return redirect(url_for("upload"))
+        g.run_id = run_id
+        with stage("render"):
+            if context.get("kind") == "compare":
+                return render_template("compare.html", **context)
+            # Charts are small inline SVG drawn from the stored numbers
+            data = context.get("chart_data") or chart_data(context["df"])
+            context.update(render_svg_charts(data, context["module"]))
+            # The rows themselves are fetched page by page from /api/runs/<id>/results
+            return render_template("results.html", page_size=PAGE_SIZE, **context)
+
+    job_id = request.args.get("job")
+    if not job_id:
+        # Old-style link (?module=M2) - there is no shared "last upload" any more
+        flash("📁 Please upload a submissions ZIP file")
+        return redirect(url_for("upload"))
+
+    job = _job_state(job_id)
+    if job is None:
+        # Jobs are forgotten after a restart, but their runs are still on disk
+        if run_exists(RUNS_DIR, job_id):
+            return redirect(url_for("results", run=job_id))
+        flash("❌ Grading run not found")
+        return redirect(url_for("upload"))
+
+    if job["status"] == "failed":
+        flash(f"❌ Grading failed: {job['error']}")
+        return redirect(url_for("upload"))
+
+    # Still grading - show a progress page that reloads when the job is done
+    if job["status"] == "running":
+        return render_template("progress.html", job=job, module_name=module_name(job["module"]))
+
+    return redirect(url_for("results", run=job["result"]))
+
+
+def _job_state(job_id):
+    """
+    Status dict of a job, or None if it is unknown
+    Jobs started by another worker process are read from their status file
+    """
+    job = get_job(job_id)
+    if job is not None:
+        return {**job.to_dict(), "result": job.result}
+    folder = run_dir(RUNS_DIR, job_id)
+    if folder is None:
+        return None
+    return read_status(folder / STATUS_FILE)
+
+
+@app.route("/jobs/<job_id>")
+def job_status(job_id):
+    """Progress of a grading job as JSON"""
+    job = _job_state(job_id)
+    if job is None:
+        return jsonify({"error": "job not found"}), 404
+    return jsonify(job)
+
+
+def _api_error(message, status=400):
+    return jsonify({"error": message}), status
+
+
+@app.route("/api/runs/<run_id>/results")
+def api_results(run_id):
+    """
+    One page of a run's graded rows as JSON
+    ?offset=0&limit=50     page (limit up to MAX_PAGE_SIZE)
+    ?sort=<column>&order=asc|desc
+    ?failed=1              grade 1 only
+    ?below=70              total_grade under 70
+    ?file=text             file name contains text
+    """
+    with stage("load_run"):
+        table = load_table(RUNS_DIR, run_id)
+    if table is None:
+        return _api_error("run not found", 404)
+    columns, rows, _ = table
+
+    args = request.args
+    try:
+        offset = max(int(args.get("offset", 0)), 0)
+        limit = min(max(int(args.get("limit", PAGE_SIZE)), 1), MAX_PAGE_SIZE)
+        below = float(args["below"]) if args.get("below") else None
+    except ValueError:
+        return _api_error("offset, limit and below must be numbers")
+    sort = args.get("sort") or None
+    if sort is not None and sort not in columns:
+        return _api_error(f"unknown sort column: {sort}")
+    order = args.get("order", "asc")
+    if order not in ("asc", "desc"):
+        return _api_error("order must be asc or desc")
+
+    with stage("query"):
+        matched = query_rows(rows, sort, order == "desc", args.get("failed") in ("1", "true"),
+                             below, args.get("file"))
+    page = matched[offset:offset + limit]
+    return jsonify({
+        "run_id": run_id,
+        "columns": columns,
+        "total": len(rows),
+        "matched": len(matched),
+        "offset": offset,
+        "limit": limit,
+        "rows": [{"index": i, **rows[i]} for i in page],
+    })
+
+
+@app.route("/api/runs/<run_id>/results/<int:index>")
+def api_result_detail(run_id, index):
+    """Feedback and code preview of one row (index as returned by api_results)"""
+    table = load_table(RUNS_DIR, run_id)
+    if table is None:
+        return _api_error("run not found", 404)
+    _, rows, feedback = table
+    if index >= len(rows):
+        return _api_error("row not found", 404)
+    detail = feedback[index] if index < len(feedback) else {}
+    return jsonify({"index": index, "failed": detail.get("failed", False), **rows[index],
+                    "feedback": detail.get("feedback", {}), "snippet": detail.get("snippet", "")})
+
+
+@app.route("/api/uploads", methods=["POST"])
+def api_upload_start():
+    """
+    Start a chunked upload: JSON {"filename", "size", "sha256" (optional)}
+    Then PUT the bytes to upload_url in order (?offset=<bytes sent so far>),
+    and POST the grading form to finish_url
+    """
+    data = request.get_json(silent=True) or {}
+    _cleanup_runs()
+    try:
+        upload = chunked_upload.start(RUNS_DIR, data.get("filename"), data.get("size"), data.get("sha256"))
+    except UploadError as e:
+        return _api_error(str(e), 413 if isinstance(e, UploadTooLarge) else 400)
+    return jsonify({**upload.to_dict(), "chunk_size": chunked_upload.CHUNK_SIZE,
+                    "upload_url": url_for("api_upload", upload_id=upload.id),
+                    "finish_url": url_for("api_upload_finish", upload_id=upload.id)}), 201
+
+
+def _upload_or_error(upload_id):
+    upload = chunked_upload.get(RUNS_DIR, upload_id)
+    if upload is None:
+        return None, _api_error("upload not found", 404)
+    if upload.rejected:
+        chunked_upload.discard(upload)
+        return None, _api_error(f"🚫 ZIP rejected: {upload.rejected}", 422)
+    return upload, None
+
+
+@app.route("/api/uploads/<upload_id>", methods=["GET", "PUT", "DELETE"])
+def api_upload(upload_id):
+    """
+    GET: where the upload stands (offset = bytes received; resume from there)
+    PUT ?offset=N: the next chunk as the raw request body
+    DELETE: abandon the upload
+    """
+    upload, error = _upload_or_error(upload_id)
+    if error:
+        return error
+    if request.method == "DELETE":
+        chunked_upload.discard(upload)
+        return jsonify({"upload_id": upload_id, "deleted": True})
+    if request.method == "PUT":
+        try:
+            offset = int(request.args["offset"])
+        except (KeyError, ValueError):
+            return _api_error("offset must be a number")
+        length = request.content_length
+        if length is None:
+            return _api_error("Content-Length is required", 411)
+        try:
+            with stage("upload"):
+                # Read straight from the socket - no form parsing, nothing spooled
+                upload.write(offset, request.stream, length)
+        except UploadConflict as e:
+            return jsonify({"error": str(e), "offset": e.offset}), 409
+        except UploadError as e:
+            if upload.rejected:
+                chunked_upload.discard(upload)
+                return _api_error(f"🚫 ZIP rejected: {e}", 422)
+            return _api_error(str(e), 413 if isinstance(e, UploadTooLarge) else 400)
+    return jsonify(upload.to_dict())
+
+
+@app.route("/api/uploads/<upload_id>/finish", methods=["POST"])
+def api_upload_finish(upload_id):
+    """Grade a completed upload: the upload form's fields (module, course, fixtures, solution_file)"""
+    upload, error = _upload_or_error(upload_id)
+    if error:
+        return error
+    module = request.form.get("module")
+    if module not in CRITERIA_MAP and module != ALL_MODULES:
+        return _api_error("❌ Invalid module selection")
+    if not upload.complete:
+        return jsonify({"error": "upload is not complete", "offset": upload.received}), 409
+    if not zipfile.is_zipfile(upload.zip_path):
+        chunked_upload.discard(upload)
+        return _api_error("❌ The uploaded file is not a valid ZIP archive", 422)
+
+    course = request.form.get("course", "").strip() or "default"
+    fixtures = sandbox.parse_fixtures(request.form.get("fixtures", ""))
+    sol = request.files.get("solution_file")
+    solution_path = None
+    if sol and sol.filename:
+        solution_path = upload.folder / f"solution{Path(sol.filename).suffix}"
+        sol.save(solution_path)
+
+    chunked_upload.release(upload, graded=True)
+    job = _start_grading(upload.id, upload.folder, upload.zip_path, module, course, solution_path, fixtures)
+    flash(f"✅ Successfully uploaded files for {module_name(module)}")
+    return jsonify({"job_id": job.id, "sha256": upload.sha256,
+                    "results_url": url_for("results", job=job.id)})
+
+
+@app.route("/history")
+def history():
+    """Grade history across runs: student progress, criterion trends, cohorts"""
+    return render_template("history.html", courses=HISTORY.courses(), modules=MODULE_NAMES)
+
+
+def _history_args():
+    """since / until (UNIX seconds) from the query string; ValueError if malformed"""
+    args = request.args
+    return (float(args["since"]) if args.get("since") else None,
+            float(args["until"]) if args.get("until") else None)
+
+
+@app.route("/api/history/students")
+def api_history_students():
+    """Students matching ?q= (start of the name), optionally in ?course="""
+    try:
+        limit = min(max(int(request.args.get("limit", PAGE_SIZE)), 1), MAX_PAGE_SIZE)
+    except ValueError:
+        return _api_error("limit must be a number")
+    with stage("history"):
+        found = HISTORY.students(request.args.get("q", ""), request.args.get("course") or None, limit)
+    return jsonify({"students": found})
+
+
+@app.route("/api/history/students/<student>")
+def api_history_student(student):
+    """Every graded submission of one student across modules and runs"""
+    with stage("history"):
+        progress = HISTORY.student_progress(student, request.args.get("course") or None)
+    if not progress["submissions"]:
+        return _api_error("student not found", 404)
+    return jsonify(progress)
+
+
+@app.route("/api/history/trends")
+def api_history_trends():
+    """Per-run criterion averages for ?module= over time (?course=, ?since=, ?until=)"""
+    module = request.args.get("module")
+    if module not in CRITERIA_MAP:
+        return _api_error("unknown module")
+    try:
+        since, until = _history_args()
+    except ValueError:
+        return _api_error("since and until must be numbers")
+    with stage("history"):
+        trends = HISTORY.criterion_trends(module, request.args.get("course") or None, since, until)
+    return jsonify({"module": module, "trends": trends})
 
 
-@app.route("/download/<filename>")
-def download(filename):
-    path = UPLOAD_DIR / filename
-    if not path.exists():
+@app.route("/api/history/cohorts")
+def api_history_cohorts():
+    """Course-by-course comparison for ?module= (repeat ?course= to pick courses)"""
+    module = request.args.get("module")
+    if module not in CRITERIA_MAP:
+        return _api_error("unknown module")
+    with stage("history"):
+        cohorts = HISTORY.cohorts(module, request.args.getlist("course"))
+    return jsonify({"module": module, "cohorts": cohorts})
+
+
+@app.route("/metrics")
+def metrics():
+    """Stage timing histograms and cache counters in Prometheus text format"""
+    cache = SCORE_CACHE.stats()
+    text = timing.render_metrics({
+        "m7pro_score_cache_hits_total": ("counter", "Score cache hits", cache["hits"]),
+        "m7pro_score_cache_misses_total": ("counter", "Score cache misses", cache["misses"]),
+        "m7pro_score_cache_bytes": ("gauge", "Size of the score cache", cache["bytes"]),
+        "m7pro_jobs_running": ("gauge", "Grading jobs running in this process", len(running_job_ids())),
+    })
+    return Response(text, mimetype="text/plain; version=0.0.4")
+
+
+def _build_excel(run_id, folder, filename):
+    """
+    Write the run's Excel file if it doesn't exist yet
+    This is the only place charts are rasterized, so matplotlib is
+    not loaded until someone actually downloads a workbook
+    """
+    with EXCEL_LOCK:
+        if (folder / filename).is_file():
+            return
+        context = load_run(RUNS_DIR, run_id)
+        if context is None or context.get("excel_filename") != filename:
+            return
+        from excel_export import write_excel   # loads openpyxl (and matplotlib for the charts)
+        with stage("excel"):
+            write_excel(folder / filename, context["df"], context["module"], context["feedback"],
+                        similarity=context.get("similarity"))
+
+
+@app.route("/download/<run_id>/<filename>")
+def download(run_id, filename):
+    folder = run_dir(RUNS_DIR, run_id)
+    if folder is not None and filename.endswith(".xlsx"):
+        _build_excel(run_id, folder, filename)
+    if folder is None or not (folder / filename).is_file():
         flash("❌ File not found")
         return redirect(url_for("index"))
-    return send_file(path, as_attachment=True)
+    # Streamed from disk in chunks, however big the workbook is
+    return send_from_directory(folder, filename, as_attachment=True)
 
 
 @app.route("/shutdown", methods=["POST"])
@@ -220,4 +754,5 @@ def shutdown():
 
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()   # needed for the grading pool inside the EXE
     app.run(debug=True)
\ No newline at end of file
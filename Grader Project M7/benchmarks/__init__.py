@@ -0,0 +1,3 @@
+"""
+Benchmark suite for M7Pro Grader (see benchmarks/__main__.py)
+"""
@@ -0,0 +1,34 @@
+"""
+Run the grader benchmarks:
+    python -m benchmarks --files 500 --seed 1 --out bench.json
+Run from the project folder (next to app.py)
+"""
+import argparse
+
+from benchmarks.bench import run_benchmarks, write_results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Time the M7Pro grading pipeline")
+    parser.add_argument("--files", type=int, default=200, help="number of synthetic submissions")
+    parser.add_argument("--seed", type=int, default=0, help="corpus seed (same seed = same files)")
+    parser.add_argument("--blocks", type=int, default=8, help="code blocks per normal file (file size)")
+    parser.add_argument("--module", default="M5", help="rubric to grade against")
+    parser.add_argument("--workers", type=int, default=None, help="workers for the parallel run (default: one per CPU)")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per stage")
+    parser.add_argument("--work-dir", default=None, help="where to generate the corpus (default: a temp folder)")
+    parser.add_argument("--out", default="bench_results.json", help="JSON file to write")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(files=args.files, seed=args.seed, blocks=args.blocks, module=args.module,
+                             workers=args.workers, repeat=args.repeat, work_dir=args.work_dir)
+    write_results(results, args.out)
+
+    for name, r in results["results"].items():
+        per_item = f"  ({r['per_item_ms']} ms/file)" if "per_item_ms" in r else ""
+        print(f"{name:<40} best {r['best']:.4f}s{per_item}")
+    print(f"\nSaved to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
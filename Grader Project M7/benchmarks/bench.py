@@ -0,0 +1,134 @@
+"""
+Timing suite for M7Pro Grader
+Times each stage of the grading pipeline against a synthetic corpus
+and writes the numbers to JSON so runs can be compared before/after changes
+"""
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+from benchmarks.corpus import generate_corpus, zip_corpus
+
+
+def _timed(func, repeat):
+    """Run func repeat times; return (timings in seconds, last return value)"""
+    times = []
+    value = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        value = func()
+        times.append(time.perf_counter() - start)
+    return times, value
+
+
+def _summary(times, items=None):
+    out = {
+        "runs": [round(t, 6) for t in times],
+        "best": round(min(times), 6),
+        "mean": round(statistics.mean(times), 6),
+    }
+    if items:
+        out["per_item_ms"] = round(min(times) / items * 1000, 4)
+    return out
+
+
+def _full_results_path(zip_path, module, work_dir):
+    """
+    Upload the ZIP through the Flask test client, wait for the grading job
+    and load the results page - the same path a browser takes
+    """
+    # app.py keeps its data in ./uploads, so point it at a scratch folder
+    old_cwd = os.getcwd()
+    os.chdir(work_dir)
+    try:
+        import app as grader_app
+        client = grader_app.app.test_client()
+
+        def once():
+            with open(zip_path, "rb") as f:
+                r = client.post("/upload", data={"module": module, "submissions_zip": (f, "submissions.zip")},
+                                content_type="multipart/form-data")
+            job_id = r.headers["Location"].rsplit("=", 1)[1]
+            while client.get(f"/jobs/{job_id}").get_json()["status"] == "running":
+                time.sleep(0.01)
+            page = client.get(f"/results?run={job_id}")
+            assert page.status_code == 200, page.status_code
+            return job_id
+
+        # First upload scores everything, the second one hits the score cache
+        cold, _ = _timed(once, 1)
+        warm, job_id = _timed(once, 1)
+        view, _ = _timed(lambda: client.get(f"/results?run={job_id}"), 3)
+        return cold, warm, view
+    finally:
+        os.chdir(old_cwd)
+
+
+def run_benchmarks(files=200, seed=0, blocks=8, module="M5", workers=None, repeat=3, work_dir=None):
+    """Generate a corpus, time every stage and return the results dict"""
+    import grader
+    from functions import get_code_metrics
+    from excel_export import make_excel_from_df
+
+    work_dir = work_dir or tempfile.mkdtemp(prefix="m7pro_bench_")
+    corpus_dir = os.path.join(work_dir, "corpus")
+    paths = generate_corpus(corpus_dir, count=files, seed=seed, blocks=blocks)
+    zip_path = zip_corpus(corpus_dir, os.path.join(work_dir, "submissions.zip"))
+    sources = [grader._read_source(p) for p in paths]
+    criteria = grader.CRITERIA_MAP[module]
+    n = len(sources)
+
+    results = {}
+
+    times, _ = _timed(lambda: [get_code_metrics(s) for s in sources], repeat)
+    results["functions.get_code_metrics"] = _summary(times, n)
+
+    times, _ = _timed(lambda: [grader._score(s, criteria) for s in sources], repeat)
+    results["grader._score"] = _summary(times, n)
+
+    times, (df, feedback) = _timed(lambda: grader.grade_folder(corpus_dir, criteria), repeat)
+    results["grader.grade_folder[serial]"] = _summary(times, n)
+
+    times, _ = _timed(lambda: grader.grade_folder(corpus_dir, criteria, workers=workers), repeat)
+    results[f"grader.grade_folder[workers={workers or 'cpu'}]"] = _summary(times, n)
+
+    times, _ = _timed(lambda: grader.grade_zip(zip_path, criteria), repeat)
+    results["grader.grade_zip[serial]"] = _summary(times, n)
+
+    times, _ = _timed(lambda: make_excel_from_df(df, module, feedback), repeat)
+    results["excel_export.make_excel_from_df"] = _summary(times, n)
+
+    app_dir = os.path.join(work_dir, "app")
+    os.makedirs(app_dir, exist_ok=True)
+    cold, warm, view = _full_results_path(zip_path, module, app_dir)
+    results["/results[cold upload]"] = _summary(cold, n)
+    results["/results[re-upload, cached]"] = _summary(warm, n)
+    results["/results[view stored run]"] = _summary(view)
+
+    corpus_bytes = sum(os.path.getsize(p) for p in paths)
+    return {
+        "meta": {
+            "files": n,
+            "corpus_bytes": corpus_bytes,
+            "seed": seed,
+            "blocks": blocks,
+            "module": module,
+            "workers": workers,
+            "repeat": repeat,
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": results,
+    }
+
+
+def write_results(results, path):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    return path
@@ -0,0 +1,108 @@
+"""
+Synthetic submission corpus for the M7Pro Grader benchmarks
+Generates a reproducible (seeded) set of student-style .py files:
+- normal programs mixing input/print, lists, decisions, loops and functions
+- files with 'while True' (auto-fail)
+- files with syntax errors (auto-fail)
+- huge files
+- files that aren't valid UTF-8
+"""
+import os
+import random
+import zipfile
+
+NAMES = ["total", "price", "count", "name", "score", "items", "grades", "value", "result", "age"]
+
+# Default share of each kind of file
+DEFAULT_MIX = {
+    "normal": 0.80,
+    "while_true": 0.06,
+    "syntax_error": 0.06,
+    "huge": 0.04,
+    "non_utf8": 0.04,
+}
+
+
+def _block(rng):
+    """One random chunk of student-style code"""
+    a, b = rng.sample(NAMES, 2)
+    kind = rng.randrange(6)
+    if kind == 0:
+        return (f"# Ask the user for the {a}\n"
+                f"{a} = input(\"Enter {a}: \")\n"
+                f"print(\"You entered\", {a})\n")
+    if kind == 1:
+        return (f"# Store a few values in a list\n"
+                f"{a} = [{rng.randint(1, 9)}, {rng.randint(10, 99)}, {rng.randint(100, 999)}]\n"
+                f"{b} = {{\"first\": {a}[0], \"last\": {a}[-1]}}\n"
+                f"print({b})\n")
+    if kind == 2:
+        return (f"{a} = {rng.randint(0, 100)}\n"
+                f"if {a} >= 90:\n    print(\"A\")\n"
+                f"elif {a} >= 80:\n    print(\"B\")\n"
+                f"else:\n    print(\"Keep trying\")\n")
+    if kind == 3:
+        return (f"{a} = 0\n"
+                f"for i in range({rng.randint(2, 20)}):\n"
+                f"    {a} = {a} + i  # running total\n"
+                f"print(\"Sum:\", {a})\n")
+    if kind == 4:
+        return (f"def calc_{a}(x, y):\n"
+                f"    \"\"\"Return the {a} of x and y\"\"\"\n"
+                f"    return x * y\n\n"
+                f"print(calc_{a}({rng.randint(1, 9)}, {rng.randint(1, 9)}))\n")
+    return (f"{a} = {rng.randint(1, 50)}\n"
+            f"while {a} > 0:\n"
+            f"    {a} -= {rng.randint(1, 5)}\n"
+            f"print(\"done\", \"while True is not used here\")\n")
+
+
+def make_source(rng, kind, blocks=8):
+    """Return the bytes of one submission of the given kind"""
+    body = "".join(_block(rng) for _ in range(blocks))
+    header = f"# Student submission\n# Program: {rng.choice(NAMES)} calculator\n\n"
+
+    if kind == "while_true":
+        body += "\nwhile True:\n    answer = input(\"Again? \")\n    print(answer)\n"
+    elif kind == "syntax_error":
+        body += "\nif total > 10\n    print(\"missing colon\")\n"
+    elif kind == "huge":
+        body = "".join(_block(rng) for _ in range(blocks * 400))
+    elif kind == "non_utf8":
+        header += "# Autor: José Müller\n"
+        return (header + body).encode("latin-1")
+    return (header + body).encode("utf-8")
+
+
+def generate_corpus(out_dir, count=200, seed=0, blocks=8, mix=None, nested=True):
+    """
+    Write count submissions under out_dir and return the list of file paths
+    Same seed + arguments always gives the same files
+    blocks controls the size of a normal file; nested spreads files over
+    per-section sub-folders like a real LMS export
+    """
+    rng = random.Random(seed)
+    mix = mix or DEFAULT_MIX
+    kinds = list(mix)
+    weights = [mix[k] for k in kinds]
+
+    paths = []
+    for i in range(count):
+        kind = rng.choices(kinds, weights)[0]
+        folder = os.path.join(out_dir, f"section_{i % 5}") if nested else out_dir
+        os.makedirs(folder, exist_ok=True)
+        path = os.path.join(folder, f"student_{i:05d}_{kind}.py")
+        with open(path, "wb") as f:
+            f.write(make_source(rng, kind, blocks))
+        paths.append(path)
+    return paths
+
+
+def zip_corpus(src_dir, zip_path):
+    """ZIP a generated corpus the way instructors upload submissions"""
+    with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED) as z:
+        for root, _, files in os.walk(src_dir):
+            for f in sorted(files):
+                full = os.path.join(root, f)
+                z.write(full, os.path.relpath(full, src_dir))
+    return zip_path
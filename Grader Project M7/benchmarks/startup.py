@@ -0,0 +1,163 @@
+"""
+Startup timing for M7Pro Grader
+- import report: what `import app` costs, module by module (python -X importtime)
+- time to first response: from starting the server process until GET /
+  answers, the "double-click to ready" time users notice
+Run from the project folder (next to app.py):
+    python -m benchmarks.startup --repeat 5 --out startup.json
+    python -m benchmarks.startup --exe dist/M7Pro_Grader.exe
+"""
+import argparse
+import json
+import os
+import platform
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+from benchmarks.bench import write_results
+
+# Modules that should NOT be loaded just by starting the app
+HEAVY_MODULES = ("pandas", "numpy", "matplotlib", "openpyxl", "requests", "pyarrow")
+
+_PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _env():
+    """Environment that lets a child process in a scratch folder import app.py"""
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(p for p in (_PROJECT_DIR, env.get("PYTHONPATH")) if p)
+    return env
+
+
+def _parse_importtime(stderr):
+    """[(module, self_us, cumulative_us, depth)] from -X importtime output"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return rows
+
+
+def import_report(top=25, work_dir=None):
+    """
+    Import `app` in a fresh interpreter with -X importtime
+    Returns total time, the slowest modules and which heavy modules got loaded
+    """
+    work_dir = work_dir or tempfile.mkdtemp(prefix="m7pro_startup_")
+    code = f"import sys, json, app; print(json.dumps([m for m in {HEAVY_MODULES!r} if m in sys.modules]))"
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=work_dir, env=_env(),
+                          capture_output=True, text=True, check=True)
+    rows = _parse_importtime(proc.stderr)
+    total = next((cum for name, _, cum, depth in rows if name == "app" and depth == 0), 0)
+    slowest = sorted(rows, key=lambda r: r[2], reverse=True)[:top]
+    return {
+        "import_app_ms": round(total / 1000, 1),
+        "heavy_loaded": json.loads(proc.stdout.strip().splitlines()[-1]),
+        "slowest": [{"module": name, "self_ms": round(s / 1000, 1), "cumulative_ms": round(c / 1000, 1)}
+                    for name, s, c, _ in slowest],
+    }
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_for(url, proc, timeout):
+    """Poll url until it answers; returns seconds waited or None on timeout / exit"""
+    start = time.perf_counter()
+    while time.perf_counter() - start < timeout:
+        if proc.poll() is not None:
+            return None
+        try:
+            with urllib.request.urlopen(url, timeout=1) as r:
+                if r.status == 200:
+                    return time.perf_counter() - start
+        except OSError:
+            time.sleep(0.01)
+    return None
+
+
+def time_to_first_response(repeat=3, exe=None, url=None, timeout=120, work_dir=None):
+    """
+    Start the server repeat times and time until GET / answers
+    exe: a built M7Pro_Grader.exe to time instead of `python app.py`
+    """
+    work_dir = work_dir or tempfile.mkdtemp(prefix="m7pro_startup_")
+    times = []
+    for _ in range(repeat):
+        if exe:
+            command = [exe]
+            target = url or "http://127.0.0.1:5000/"
+        else:
+            port = _free_port()
+            command = [sys.executable, "-c",
+                       f"import app; app.app.run(host='127.0.0.1', port={port}, use_reloader=False)"]
+            target = url or f"http://127.0.0.1:{port}/"
+        start = time.perf_counter()
+        proc = subprocess.Popen(command, cwd=work_dir, env=_env(),
+                                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            waited = _wait_for(target, proc, timeout)
+            if waited is None:
+                raise RuntimeError(f"server did not answer {target} within {timeout}s")
+            times.append(time.perf_counter() - start)
+        finally:
+            proc.terminate()
+            try:
+                proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+    return {
+        "runs": [round(t, 4) for t in times],
+        "best": round(min(times), 4),
+        "median": round(statistics.median(times), 4),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.startup",
+                                     description="Time M7Pro Grader startup")
+    parser.add_argument("--repeat", type=int, default=3, help="server starts to time")
+    parser.add_argument("--top", type=int, default=20, help="slowest imports to list")
+    parser.add_argument("--exe", default=None, help="time a built EXE instead of app.py")
+    parser.add_argument("--url", default=None, help="URL to poll (default: the app's home page)")
+    parser.add_argument("--out", default="startup_results.json", help="JSON file to write")
+    args = parser.parse_args(argv)
+
+    results = {
+        "meta": {
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "exe": args.exe,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "time_to_first_response": time_to_first_response(args.repeat, args.exe, args.url),
+    }
+    if not args.exe:
+        results["imports"] = import_report(args.top)
+    write_results(results, args.out)
+
+    if "imports" in results:
+        imports = results["imports"]
+        print(f"import app: {imports['import_app_ms']} ms")
+        print(f"heavy modules loaded at import: {', '.join(imports['heavy_loaded']) or 'none'}")
+        print(f"\n{'module':<45} {'self ms':>8} {'cumul. ms':>10}")
+        for row in imports["slowest"]:
+            print(f"{row['module']:<45} {row['self_ms']:>8} {row['cumulative_ms']:>10}")
+    ttfr = results["time_to_first_response"]
+    print(f"\ntime to first response: best {ttfr['best']}s, median {ttfr['median']}s")
+    print(f"\nSaved to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
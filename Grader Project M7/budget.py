@@ -0,0 +1,291 @@
+"""
+Per-file resource budgets for M7Pro Grader
+One pathological submission (a multi-megabyte generated file, code that
+sends the parser into deep recursion) must not stall a whole grading run:
+- size: files over MAX_FILE_BYTES are not analyzed at all
+- time: a watchdog kills a scoring worker that spends more than
+  TIME_SECONDS on one file and starts a fresh one for the remaining files
+- memory: each worker may grow by at most MEMORY_BYTES (POSIX only)
+A file that goes over budget comes back as a Limit instead of a result, and
+the grader turns it into a grade-1 "resource limit" result
+Set a budget to 0 (e.g. M7PRO_FILE_SECONDS=0) to turn it off
+"""
+import multiprocessing
+import os
+import time
+from collections import deque
+from multiprocessing.connection import wait
+
+MAX_FILE_BYTES = int(os.environ.get("M7PRO_MAX_FILE_BYTES", 1_000_000))
+TIME_SECONDS = float(os.environ.get("M7PRO_FILE_SECONDS", 10))
+MEMORY_BYTES = int(os.environ.get("M7PRO_FILE_MEMORY_MB", 512)) * 1024 * 1024
+
+# Files this small are scored in-process even in a serial run - they are
+# done in milliseconds, so starting a watched worker would cost more
+WATCH_MIN_BYTES = 64 * 1024
+
+# How long a new worker may take to start before the pool gives up
+STARTUP_SECONDS = 60
+
+LIMIT_KINDS = ("size", "time", "memory", "error")
+
+_READY = "ready"
+
+
+class Budget:
+    """Per-file limits; 0 turns a limit off"""
+
+    def __init__(self, max_bytes=MAX_FILE_BYTES, seconds=TIME_SECONDS, memory_bytes=MEMORY_BYTES):
+        self.max_bytes = max_bytes
+        self.seconds = seconds
+        self.memory_bytes = memory_bytes
+
+    @property
+    def watched(self):
+        """True if files need a worker process that can be killed"""
+        return bool(self.seconds or self.memory_bytes)
+
+    def to_dict(self):
+        return {"max_bytes": self.max_bytes, "seconds": self.seconds, "memory_bytes": self.memory_bytes}
+
+
+DEFAULT_BUDGET = Budget()
+
+
+class Limit:
+    """Stands in for the result of a file that went over budget"""
+
+    __slots__ = ("kind", "detail")
+
+    def __init__(self, kind, detail=""):
+        self.kind = kind
+        self.detail = detail
+
+    def __repr__(self):
+        return f"Limit({self.kind!r}, {self.detail!r})"
+
+
+def _limit_memory(extra):
+    """Let this process grow by at most extra bytes of address space"""
+    if not extra:
+        return
+    try:
+        import resource
+        with open("/proc/self/statm") as f:
+            current = int(f.read().split()[0]) * os.sysconf("SC_PAGE_SIZE")
+        resource.setrlimit(resource.RLIMIT_AS, (current + extra, current + extra))
+    except (ImportError, OSError, ValueError):
+        # No rlimits (Windows) or no /proc (macOS): time and size budgets still apply
+        pass
+
+
+def _context():
+    """
+    forkserver where there is one (POSIX), spawn elsewhere - never plain
+    fork: pools start from job threads while other threads may hold locks
+    (sqlite, caches, timing), and a forked child would inherit them held
+    """
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+
+
+def call_guarded(func, item):
+    """func(item), or a Limit if it raised"""
+    try:
+        return func(item)
+    except MemoryError:
+        return Limit("memory", "MemoryError")
+    except Exception as e:
+        return Limit("error", type(e).__name__)
+
+
+def _worker_main(conn, func, memory_bytes):
+    _limit_memory(memory_bytes)
+    conn.send(_READY)
+    while True:
+        try:
+            chunk = conn.recv()
+        except EOFError:
+            return
+        if chunk is None:
+            return
+        for item in chunk:
+            conn.send(call_guarded(func, item))
+
+
+class _Worker:
+    def __init__(self, ctx, func, memory_bytes):
+        self.conn, child = ctx.Pipe()
+        self.process = ctx.Process(target=_worker_main, args=(child, func, memory_bytes), daemon=True)
+        self.process.start()
+        child.close()
+        self.ready = False
+        self.pending = deque()      # (key, item) sent and not answered yet, in order
+        self.deadline = time.monotonic() + STARTUP_SECONDS
+
+    def kill(self):
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+
+class WatchdogPool:
+    """
+    Worker processes that apply func to items under a Budget
+    A worker that overruns the time budget, or dies, is replaced; the file
+    it was on becomes a Limit and the rest of its chunk goes to the new one
+    """
+
+    def __init__(self, func, workers=1, budget=None, chunksize=1, size=len):
+        self.func = func
+        self.budget = budget or DEFAULT_BUDGET
+        self.chunksize = max(1, chunksize)
+        self.size = size
+        self._ctx = _context()
+        self._workers = [self._spawn() for _ in range(max(1, workers))]
+        self._retry = deque()       # items taken back from replaced workers
+
+    def _spawn(self):
+        return _Worker(self._ctx, self.func, self.budget.memory_bytes)
+
+    def _replace(self, worker):
+        worker.kill()
+        self._retry.extendleft(reversed(worker.pending))
+        fresh = self._spawn()
+        self._workers[self._workers.index(worker)] = fresh
+
+    def _fill(self, worker, items, over_size):
+        """Send the worker its next chunk; oversized files go to over_size instead"""
+        chunk = []
+        while len(chunk) < self.chunksize:
+            if self._retry:
+                chunk.append(self._retry.popleft())
+                continue
+            try:
+                key, item = next(items)
+            except StopIteration:
+                break
+            n = self.size(item)
+            if self.budget.max_bytes and n > self.budget.max_bytes:
+                over_size.append((key, Limit("size", f"{n} bytes")))
+            else:
+                chunk.append((key, item))
+        if chunk:
+            worker.pending.extend(chunk)
+            worker.conn.send([item for _, item in chunk])
+            if worker.ready:
+                # The clock restarts when an idle worker gets new files
+                worker.deadline = time.monotonic() + (self.budget.seconds or float("inf"))
+
+    def imap_unordered(self, items):
+        """
+        Yield (key, result or Limit) for (key, item) pairs as workers finish
+        them; only a few chunks are read ahead of the workers
+        """
+        items = iter(items)
+        seconds = self.budget.seconds or float("inf")
+        while True:
+            over_size = []
+            for worker in self._workers:
+                if not worker.pending:
+                    self._fill(worker, items, over_size)
+            yield from over_size
+            busy = [w for w in self._workers if w.pending]
+            if not busy:
+                if over_size:
+                    continue
+                return
+
+            now = time.monotonic()
+            timeout = max(0.0, min(w.deadline for w in busy) - now)
+            ready = wait([w.conn for w in busy], timeout=None if timeout == float("inf") else timeout)
+            for worker in busy:
+                if worker.conn not in ready:
+                    continue
+                try:
+                    message = worker.conn.recv()
+                except (EOFError, OSError):
+                    # Died mid-file: most likely killed by the memory limit
+                    key, _ = worker.pending.popleft()
+                    kind = "memory" if self.budget.memory_bytes else "error"
+                    yield key, Limit(kind, "worker process died")
+                    self._replace(worker)
+                    continue
+                if message == _READY:
+                    worker.ready = True
+                else:
+                    key, _ = worker.pending.popleft()
+                    yield key, message
+                worker.deadline = time.monotonic() + seconds
+
+            now = time.monotonic()
+            for worker in list(self._workers):
+                if worker.pending and now > worker.deadline:
+                    if not worker.ready:
+                        raise RuntimeError("scoring worker did not start")
+                    key, _ = worker.pending.popleft()
+                    yield key, Limit("time", f"over {self.budget.seconds}s")
+                    self._replace(worker)
+
+    def close(self):
+        for worker in self._workers:
+            try:
+                worker.conn.send(None)
+            except OSError:
+                pass
+            worker.process.join(timeout=1)
+            if worker.process.is_alive():
+                worker.process.kill()
+            worker.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+def guarded_map(func, items, workers=1, chunksize=1, progress=None, size=len, budget=None):
+    """
+    [func(item) or Limit] for every item, in order
+    workers > 1 scores everything in watched workers; otherwise small files
+    are scored in-process and only big ones go to a single watched worker
+    progress(n) is called with the number of items finished so far
+    """
+    budget = budget or DEFAULT_BUDGET
+    results = [None] * len(items)
+    done = 0
+    watched = []
+    for i, item in enumerate(items):
+        n = size(item)
+        if budget.max_bytes and n > budget.max_bytes:
+            results[i] = Limit("size", f"{n} bytes")
+        elif workers > 1 or (budget.watched and n > WATCH_MIN_BYTES):
+            watched.append(i)
+            continue
+        else:
+            results[i] = call_guarded(func, item)
+        done += 1
+        if progress:
+            progress(done)
+
+    if watched:
+        with WatchdogPool(func, min(workers, len(watched)), budget, chunksize, size) as pool:
+            for i, result in pool.imap_unordered((i, items[i]) for i in watched):
+                results[i] = result
+                done += 1
+                if progress:
+                    progress(done)
+    return results
+
+
+def summarize(results, budget=None):
+    """Budget counters for a run: how many files hit each limit, and the limits used"""
+    budget = budget or DEFAULT_BUDGET
+    counts = dict.fromkeys(LIMIT_KINDS, 0)
+    for r in results:
+        kind = r.get("limit")
+        if kind in counts:
+            counts[kind] += 1
+    return {**counts, "limits": budget.to_dict()}
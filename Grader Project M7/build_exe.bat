@@ -63,6 +63,7 @@ python -m PyInstaller ^
     --name M7Pro_Grader ^
     --add-data "templates;templates" ^
     --add-data "static;static" ^
+    --add-data "rubrics;rubrics" ^
     --hidden-import flask ^
     --hidden-import flask.cli ^
     --hidden-import pandas ^
@@ -0,0 +1,217 @@
+"""
+Dashboard charts for M7Pro Grader
+- Chart 1: Average score by criteria
+- Chart 2: Students with grade 1 vs other grades
+The results page draws both as small inline SVG built with plain Python
+from chart_data(); only the Excel export needs PNGs, so matplotlib is
+imported the first time a PNG is actually drawn
+PNGs use matplotlib's object-oriented Figure API (no pyplot global state),
+so charts can be drawn from several threads at once
+"""
+import hashlib
+import json
+import math
+import threading
+from collections import OrderedDict
+from html import escape
+from io import BytesIO
+
+CRITERIA_COLORS = ['#4CAF50', '#2196F3', '#FF9800', '#9C27B0', '#F44336']
+GRADE1_COLORS = ['#ef4444', '#10b981']
+
+# PNG bytes keyed by a digest of the data they were drawn from
+_CACHE_SIZE = 64
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def chart_data(df):
+    """The aggregated numbers both charts are drawn from"""
+    crit_cols = [c for c in df.columns if c not in ["file", "total_grade"]]
+    grade_1_count = int((df["total_grade"] == 1).sum())
+    return {
+        "criteria": {c: round(float(v), 4) for c, v in df[crit_cols].mean().items()},
+        "grade_1": grade_1_count,
+        "others": len(df) - grade_1_count,
+    }
+
+
+def _digest(kind, module, data):
+    blob = json.dumps([kind, module, data], sort_keys=True).encode()
+    return hashlib.sha256(blob).hexdigest()
+
+
+def _cached(kind, module, data, draw):
+    """Return cached PNG bytes for this data, drawing them on a miss"""
+    key = _digest(kind, module, data)
+    with _cache_lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            return _cache[key]
+    png = draw(module, data)
+    with _cache_lock:
+        _cache[key] = png
+        while len(_cache) > _CACHE_SIZE:
+            _cache.popitem(last=False)
+    return png
+
+
+def _new_axes():
+    """Figure + axes styled like seaborn's darkgrid, without touching rcParams"""
+    from matplotlib.figure import Figure
+    fig = Figure(figsize=(10, 5))
+    ax = fig.add_subplot()
+    ax.set_facecolor('#EAEAF2')
+    ax.grid(axis='y', color='white', linewidth=1.2)
+    ax.set_axisbelow(True)
+    for spine in ax.spines.values():
+        spine.set_visible(False)
+    return fig, ax
+
+
+def _to_png(fig):
+    img = BytesIO()
+    fig.tight_layout()
+    fig.savefig(img, format="png", dpi=100, facecolor='white')
+    return img.getvalue()
+
+
+def _draw_criteria(module, criteria_means):
+    fig, ax = _new_axes()
+    names = list(criteria_means)
+    means = list(criteria_means.values())
+    ax.bar(range(len(names)), means, color=CRITERIA_COLORS[:len(names)], edgecolor='black', linewidth=1.2)
+    ax.set_xticks(range(len(names)))
+    ax.set_xticklabels(names, rotation=45, ha='right')
+    ax.set_title(f"{module} - Average Score by Criteria", fontsize=16, fontweight='bold', pad=20)
+    ax.set_ylabel("Weighted Score (0–100)", fontsize=12)
+    ax.set_xlabel("Criteria", fontsize=12)
+    return _to_png(fig)
+
+
+def _draw_grade1(module, data):
+    fig, ax = _new_axes()
+    categories = ['Grade = 1\n(Failed)', 'Other Grades\n(Passed)']
+    counts = [data["grade_1"], data["others"]]
+    total = sum(counts)
+    pcts = [(c / total * 100) if total > 0 else 0 for c in counts]
+
+    bars = ax.bar(categories, counts, color=GRADE1_COLORS, edgecolor='black', linewidth=1.2, alpha=0.8)
+
+    # Add count and percentage labels on bars
+    for bar, count, pct in zip(bars, counts, pcts):
+        ax.text(bar.get_x() + bar.get_width() / 2., bar.get_height(),
+                f'{count} students\n({pct:.1f}%)',
+                ha='center', va='bottom', fontsize=10, fontweight='bold')
+
+    ax.set_title(f"{module} - Students with Grade 1 vs Other Grades", fontsize=16, fontweight='bold', pad=20)
+    ax.set_ylabel("Number of Students", fontsize=12)
+    return _to_png(fig)
+
+
+def render_charts(df, module):
+    """
+    Render both dashboard charts for a results DataFrame
+    Returns {"plot_criteria": png bytes or None, "plot_grade1": png bytes}
+    """
+    data = chart_data(df)
+    plot_criteria = None
+    if data["criteria"]:
+        plot_criteria = _cached("criteria", module, data["criteria"], _draw_criteria)
+    plot_grade1 = _cached("grade1", module, {"grade_1": data["grade_1"], "others": data["others"]}, _draw_grade1)
+    return {"plot_criteria": plot_criteria, "plot_grade1": plot_grade1}
+
+
+# ---------- Inline SVG for the results page ----------
+
+_W, _H = 640, 340
+_LEFT, _RIGHT, _TOP, _BOTTOM = 56, 16, 44, 96
+
+
+def _nice_max(value):
+    """Round an axis maximum up to 1, 2, 2.5 or 5 x 10^n"""
+    if value <= 0:
+        return 1
+    base = 10 ** math.floor(math.log10(value))
+    for step in (1, 2, 2.5, 5, 10):
+        if value <= step * base:
+            return step * base
+    return 10 * base
+
+
+def _fmt(v):
+    return f"{v:g}"
+
+
+def _svg(title, labels, values, colors, y_label, bar_text=None, label_angle=0):
+    """Bar chart in the same darkgrid style as the PNGs"""
+    top = _nice_max(max(values, default=0))
+    plot_w = _W - _LEFT - _RIGHT
+    plot_h = _H - _TOP - _BOTTOM
+    out = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {_W} {_H}" class="chart-svg" role="img">',
+        f"<title>{escape(title)}</title>",
+        f'<rect width="{_W}" height="{_H}" fill="#ffffff"/>',
+        f'<rect x="{_LEFT}" y="{_TOP}" width="{plot_w}" height="{plot_h}" fill="#EAEAF2"/>',
+        f'<text x="{_W / 2}" y="26" text-anchor="middle" font-size="16" font-weight="bold">{escape(title)}</text>',
+        f'<text transform="translate(16 {_TOP + plot_h / 2}) rotate(-90)" text-anchor="middle" font-size="12">'
+        f"{escape(y_label)}</text>",
+    ]
+
+    # Horizontal grid lines with y-axis labels
+    for i in range(6):
+        v = top * i / 5
+        y = _TOP + plot_h - plot_h * i / 5
+        out.append(f'<line x1="{_LEFT}" x2="{_W - _RIGHT}" y1="{y:.1f}" y2="{y:.1f}" stroke="#ffffff" stroke-width="1.2"/>')
+        out.append(f'<text x="{_LEFT - 6}" y="{y + 4:.1f}" text-anchor="end" font-size="11">{_fmt(round(v, 2))}</text>')
+
+    slot = plot_w / max(len(values), 1)
+    bar_w = slot * 0.6
+    for i, (label, value) in enumerate(zip(labels, values)):
+        h = plot_h * value / top
+        x = _LEFT + slot * i + (slot - bar_w) / 2
+        y = _TOP + plot_h - h
+        cx = x + bar_w / 2
+        out.append(f'<rect x="{x:.1f}" y="{y:.1f}" width="{bar_w:.1f}" height="{h:.1f}" '
+                   f'fill="{colors[i % len(colors)]}" stroke="#000000" stroke-width="1.2">'
+                   f"<title>{escape(label)}: {_fmt(round(value, 2))}</title></rect>")
+        if bar_text:
+            out.append(f'<text x="{cx:.1f}" y="{y - 6:.1f}" text-anchor="middle" font-size="11" '
+                       f'font-weight="bold">{escape(bar_text[i])}</text>')
+        ly = _TOP + plot_h + 16
+        if label_angle:
+            out.append(f'<text transform="translate({cx:.1f} {ly}) rotate({label_angle})" '
+                       f'text-anchor="end" font-size="11">{escape(label)}</text>')
+        else:
+            out.append(f'<text x="{cx:.1f}" y="{ly}" text-anchor="middle" font-size="12">{escape(label)}</text>')
+    out.append("</svg>")
+    return "".join(out)
+
+
+def criteria_svg(module, criteria_means):
+    """Chart 1 as SVG markup, or None if there are no criteria"""
+    if not criteria_means:
+        return None
+    names = list(criteria_means)
+    return _svg(f"{module} - Average Score by Criteria", names, list(criteria_means.values()),
+                CRITERIA_COLORS, "Weighted Score (0–100)", label_angle=-30)
+
+
+def grade1_svg(module, data):
+    """Chart 2 as SVG markup"""
+    counts = [data["grade_1"], data["others"]]
+    total = sum(counts)
+    text = [f"{c} students ({(c / total * 100) if total else 0:.1f}%)" for c in counts]
+    return _svg(f"{module} - Students with Grade 1 vs Other Grades", ["Grade = 1 (Failed)", "Other Grades (Passed)"],
+                counts, GRADE1_COLORS, "Number of Students", bar_text=text)
+
+
+def render_svg_charts(data, module):
+    """
+    Both dashboard charts as inline SVG from chart_data() output
+    Returns {"plot_criteria": svg or None, "plot_grade1": svg}
+    """
+    return {
+        "plot_criteria": criteria_svg(module, data["criteria"]),
+        "plot_grade1": grade1_svg(module, data),
+    }
@@ -0,0 +1,327 @@
+"""
+Chunked, resumable ZIP uploads for M7Pro Grader
+A large submissions ZIP is sent as a series of PUTs of raw bytes instead of
+one multipart form, so nothing is spooled and a dropped connection only
+costs the chunk that was in flight:
+- start() creates the run workspace and returns an upload id (the run id)
+- write() appends one chunk at the given offset, hashing it on the way in
+- the client asks for the current offset to resume after an error
+The local file headers are scanned as the chunks arrive, so a file that
+isn't a ZIP, or a ZIP over the grader's size limits, is refused at the
+first bad header instead of after the last byte
+State lives in the workspace (upload.json + submissions.zip.part), so an
+upload survives a server restart; the hash is rebuilt from the received
+bytes when that happens
+"""
+import hashlib
+import json
+import os
+import shutil
+import struct
+import threading
+import time
+from pathlib import Path
+
+from grader import ZIP_MAX_MEMBER_BYTES, ZIP_MAX_RATIO, ZIP_MAX_TOTAL_BYTES, ZIP_RATIO_MIN_BYTES
+from workspace import create_workspace
+
+# Chunk size the browser uses, and the largest chunk accepted
+CHUNK_SIZE = 8 * 1024 * 1024
+MAX_CHUNK_BYTES = 64 * 1024 * 1024
+
+# Largest archive accepted. It doesn't count against the runs folder's disk
+# budget: cleanup leaves uploads and running jobs alone, and the ZIP is
+# deleted once it is graded
+MAX_UPLOAD_BYTES = int(float(os.environ.get("M7PRO_MAX_UPLOAD_GB", 8)) * 1024 ** 3)
+
+# Unfinished uploads untouched for this long may be cleaned up
+IDLE_SECONDS = 24 * 3600
+
+# Bytes copied from the request per read
+_READ_BYTES = 1024 * 1024
+
+STATE_FILE = "upload.json"
+PART_FILE = "submissions.zip.part"
+ZIP_FILE = "submissions.zip"
+
+_LOCAL_HEADER = struct.Struct("<4sHHHHHIIIHH")
+_ZIP64_SIZES = 0xFFFFFFFF
+
+
+class UploadError(ValueError):
+    """Raised when a chunk or an upload can't be accepted"""
+
+
+class UploadTooLarge(UploadError):
+    """Raised when an upload or a chunk is over the size limits"""
+
+
+class UploadConflict(UploadError):
+    """Raised when a chunk doesn't start where the upload stands; offset is where it does"""
+
+    def __init__(self, offset):
+        super().__init__(f"upload is at offset {offset}")
+        self.offset = offset
+
+
+class LocalHeaderScan:
+    """
+    Walks the local file headers of a ZIP while it is still arriving
+    Each header gives a member's name and sizes, so the .py files can be
+    counted and checked against the ZIP limits long before the central
+    directory (at the very end) lands. Members whose sizes only follow
+    their data (streamed ZIPs) end the scan; the full check then happens
+    on the central directory when the archive is graded
+    """
+
+    def __init__(self):
+        self.offset = 0         # where the next header starts
+        self.members = 0
+        self.python_files = 0
+        self.declared = 0       # uncompressed bytes of the .py files
+        self.done = False
+
+    def advance(self, f, available):
+        """Read every complete header in the first available bytes of f; raises UploadError"""
+        while not self.done and self.offset + _LOCAL_HEADER.size <= available:
+            f.seek(self.offset)
+            head = f.read(_LOCAL_HEADER.size)
+            sig, _, flags, _, _, _, _, csize, usize, name_len, extra_len = _LOCAL_HEADER.unpack(head)
+            if sig in (b"PK\x01\x02", b"PK\x05\x06", b"PK\x06\x06"):
+                self.done = True            # central directory: no more members
+                return
+            if sig != b"PK\x03\x04":
+                if self.offset == 0:
+                    raise UploadError("not a ZIP archive")
+                self.done = True            # something we don't walk; the central directory decides
+                return
+            if self.offset + _LOCAL_HEADER.size + name_len + extra_len > available:
+                return
+            name = f.read(name_len).decode("utf-8" if flags & 0x800 else "cp437", "replace")
+            extra = f.read(extra_len)
+            if _ZIP64_SIZES in (csize, usize):
+                usize, csize = self._zip64_sizes(extra, usize, csize)
+            self._check(name, csize, usize)
+            if flags & 0x08:
+                self.done = True            # sizes come after the data
+                return
+            self.offset += _LOCAL_HEADER.size + name_len + extra_len + csize
+
+    @staticmethod
+    def _zip64_sizes(extra, usize, csize):
+        i = 0
+        while i + 4 <= len(extra):
+            tag, size = struct.unpack_from("<HH", extra, i)
+            if tag == 0x0001:
+                fields = extra[i + 4:i + 4 + size]
+                if usize == _ZIP64_SIZES and len(fields) >= 8:
+                    usize = struct.unpack_from("<Q", fields, 0)[0]
+                    fields = fields[8:]
+                if csize == _ZIP64_SIZES and len(fields) >= 8:
+                    csize = struct.unpack_from("<Q", fields, 0)[0]
+                break
+            i += 4 + size
+        return usize, csize
+
+    def _check(self, name, csize, usize):
+        """The same limits grader._zip_members applies, one member at a time"""
+        self.members += 1
+        if name.endswith("/") or not name.endswith(".py"):
+            return
+        self.python_files += 1
+        if usize > ZIP_MAX_MEMBER_BYTES:
+            raise UploadError(f"{name} is larger than {ZIP_MAX_MEMBER_BYTES} bytes")
+        if usize > ZIP_RATIO_MIN_BYTES and usize > ZIP_MAX_RATIO * max(csize, 1):
+            raise UploadError(f"{name} has a suspicious compression ratio")
+        self.declared += usize
+        if self.declared > ZIP_MAX_TOTAL_BYTES:
+            raise UploadError(f"ZIP expands to more than {ZIP_MAX_TOTAL_BYTES} bytes")
+
+    def to_dict(self):
+        return {"members": self.members, "python_files": self.python_files,
+                "declared_bytes": self.declared, "complete": self.done}
+
+
+class ChunkedUpload:
+    """One upload in progress, kept in its run workspace"""
+
+    def __init__(self, folder, state):
+        self.folder = Path(folder)
+        self.id = self.folder.name
+        self.filename = state["filename"]
+        self.size = state["size"]
+        self.expected_sha256 = state.get("sha256")
+        self.part = self.folder / PART_FILE
+        self.zip_path = self.folder / ZIP_FILE
+        self.lock = threading.Lock()
+        self.scan = LocalHeaderScan()
+        self.rejected = None        # why the content was refused; the upload is then discarded
+        self._hash = hashlib.sha256()
+        self._digest = state.get("received_sha256")
+        if self._digest:
+            self.received = self.size
+        else:
+            # After a restart the hash and the scan have to catch up with the bytes on disk
+            self.received = 0
+            try:
+                self._catch_up()
+            except UploadError as e:
+                self.rejected = str(e)
+
+    def _catch_up(self):
+        on_disk = self.part.stat().st_size if self.part.exists() else 0
+        if on_disk:
+            with open(self.part, "rb") as f:
+                while self.received < on_disk:
+                    data = f.read(min(_READ_BYTES, on_disk - self.received))
+                    if not data:
+                        break
+                    self._hash.update(data)
+                    self.received += len(data)
+        self._advance_scan()
+
+    def _advance_scan(self):
+        if self.scan.done or not self.received:
+            return
+        with open(self.part, "rb") as f:
+            self.scan.advance(f, self.received)
+
+    @property
+    def complete(self):
+        return self._digest is not None
+
+    @property
+    def sha256(self):
+        return self._digest or self._hash.hexdigest()
+
+    def write(self, offset, stream, length):
+        """
+        Append length bytes read from stream at offset
+        Raises UploadConflict if offset isn't where the upload stands (or
+        another chunk is being written), UploadError if the chunk is refused;
+        if it's the content that is refused, rejected says why
+        """
+        if not self.lock.acquire(blocking=False):
+            raise UploadConflict(self.received)
+        try:
+            if self.complete or offset != self.received:
+                raise UploadConflict(self.received)
+            if length > MAX_CHUNK_BYTES:
+                raise UploadTooLarge(f"chunks may be at most {MAX_CHUNK_BYTES} bytes")
+            if offset + length > self.size:
+                raise UploadError("chunk goes past the end of the file")
+            with open(self.part, "ab") as f:
+                remaining = length
+                while remaining:
+                    data = stream.read(min(_READ_BYTES, remaining))
+                    if not data:
+                        break       # connection dropped: keep what arrived, the client resumes
+                    f.write(data)
+                    self._hash.update(data)
+                    self.received += len(data)
+                    remaining -= len(data)
+            os.utime(self.folder)   # still active, so cleanup leaves it alone
+            try:
+                self._advance_scan()
+                if self.received == self.size:
+                    self._finish_file()
+            except UploadError as e:
+                self.rejected = str(e)
+                raise
+        finally:
+            self.lock.release()
+
+    def _finish_file(self):
+        digest = self._hash.hexdigest()
+        if self.expected_sha256 and digest != self.expected_sha256:
+            raise UploadError("SHA-256 of the uploaded file doesn't match")
+        os.replace(self.part, self.zip_path)
+        self._save_state(received_sha256=digest)
+        self._digest = digest
+
+    def _save_state(self, **fields):
+        path = self.folder / STATE_FILE
+        with open(path, encoding="utf-8") as f:
+            state = json.load(f)
+        state.update(fields)
+        tmp = path.with_name(path.name + ".tmp")
+        tmp.write_text(json.dumps(state), encoding="utf-8")
+        os.replace(tmp, path)
+
+    def to_dict(self):
+        return {"upload_id": self.id, "filename": self.filename, "size": self.size,
+                "offset": self.received, "complete": self.complete,
+                "sha256": self.sha256 if self.complete else None, "scan": self.scan.to_dict()}
+
+
+_uploads = {}
+_uploads_lock = threading.Lock()
+
+
+def start(root, filename, size, sha256=None):
+    """Create the workspace for a new upload; returns the ChunkedUpload"""
+    if not isinstance(size, int) or size <= 0:
+        raise UploadError("size must be a positive number of bytes")
+    if size > MAX_UPLOAD_BYTES:
+        raise UploadTooLarge(f"uploads may be at most {MAX_UPLOAD_BYTES} bytes")
+    if sha256 is not None and (not isinstance(sha256, str) or len(sha256) != 64):
+        raise UploadError("sha256 must be 64 hex digits")
+    _, folder = create_workspace(root)
+    state = {"filename": str(filename or ZIP_FILE), "size": size, "sha256": sha256 and sha256.lower(),
+             "created": time.time()}
+    (folder / STATE_FILE).write_text(json.dumps(state), encoding="utf-8")
+    (folder / PART_FILE).touch()
+    upload = ChunkedUpload(folder, state)
+    with _uploads_lock:
+        _uploads[upload.id] = upload
+    return upload
+
+
+def get(root, upload_id):
+    """The upload with this id, or None; reloaded from its workspace after a restart"""
+    from runs import run_dir
+
+    with _uploads_lock:
+        upload = _uploads.get(upload_id)
+        if upload is not None:
+            return upload
+        folder = run_dir(root, upload_id)
+        try:
+            with open(folder / STATE_FILE, encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, ValueError, TypeError):
+            return None
+        if state.get("graded"):
+            return None         # the upload is a grading run now
+        upload = ChunkedUpload(folder, state)
+        _uploads[upload_id] = upload
+        return upload
+
+
+def discard(upload):
+    """Drop an upload and its workspace"""
+    release(upload)
+    shutil.rmtree(upload.folder, ignore_errors=True)
+
+
+def release(upload, graded=False):
+    """Forget an upload; graded=True once its workspace belongs to a grading run"""
+    with _uploads_lock:
+        _uploads.pop(upload.id, None)
+    if graded:
+        upload._save_state(graded=True)
+
+
+def pending(folder, idle=IDLE_SECONDS):
+    """
+    True if the workspace holds an upload that isn't graded yet and was
+    touched within idle seconds (read from disk, so every worker process
+    agrees; cleanup must keep it)
+    """
+    folder = Path(folder)
+    try:
+        with open(folder / STATE_FILE, encoding="utf-8") as f:
+            graded = json.load(f).get("graded")
+        return not graded and time.time() - folder.stat().st_mtime <= idle
+    except (OSError, ValueError, AttributeError):
+        return False
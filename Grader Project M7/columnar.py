@@ -0,0 +1,161 @@
+"""
+Columnar (Parquet) export of grading runs for M7Pro Grader
+Every run is also saved as one typed Parquet file next to its CSV:
+- run_id, course, module        dictionary-encoded, the same on every row
+- created                       UTC timestamp of the run
+- file                          submission file name
+- one float64 column per criterion (or per module for comparison runs)
+- total_grade, failed, limit    total, auto-fail flag, resource limit hit
+The run's meta (module name, rubric weights, stats) is kept as JSON in
+the file's schema metadata, so reporting jobs can read it from the footer
+without touching the data. Files are read back memory-mapped:
+    python columnar.py uploads/runs              # export runs saved before this existed
+Needs pyarrow (pip install pyarrow); without it runs simply have no Parquet file
+"""
+import importlib.util
+import json
+import os
+import sys
+from pathlib import Path
+
+# Key of the run's meta in the Parquet schema metadata
+META_KEY = b"m7pro"
+
+# Bumped when the columns change
+SCHEMA_VERSION = 1
+
+# meta.json fields copied into the file (the rest is page rendering data)
+_META_FIELDS = ("run_id", "kind", "module", "module_name", "modules", "course", "created", "stats",
+                "module_stats", "weights", "execution", "budget", "changes")
+
+
+def available():
+    """True if pyarrow is installed (checked without importing it)"""
+    return importlib.util.find_spec("pyarrow") is not None
+
+
+def parquet_filename(module):
+    return f"M7Pro_{module}_grades.parquet"
+
+
+def run_table(df, feedback, meta):
+    """
+    pyarrow Table of one run: the graded DataFrame plus the run columns
+    feedback adds the failed / limit columns (comparison runs have none,
+    their DataFrame already has failed)
+    """
+    import pyarrow as pa   # heavy - only needed when a run is saved
+
+    n = len(df)
+    columns, fields = [], []
+
+    def add(name, array):
+        columns.append(array)
+        fields.append(pa.field(name, array.type))
+
+    def constant(value):
+        return pa.array([value] * n, pa.string()).dictionary_encode()
+
+    add("run_id", constant(meta.get("run_id")))
+    add("course", constant(meta.get("course")))
+    add("module", constant(meta.get("module")))
+    created = meta.get("created")
+    add("created", pa.array([None if created is None else int(created * 1000)] * n, pa.timestamp("ms", tz="UTC")))
+    for name in df.columns:
+        values = df[name].tolist()
+        kind = df[name].dtype.kind
+        if kind == "b":
+            add(name, pa.array(values, pa.bool_()))
+        elif kind in "iuf":
+            add(name, pa.array(values, pa.float64()))
+        else:   # file, and source in CLI exports
+            add(name, pa.array([str(v) for v in values], pa.string()))
+    if feedback:
+        add("failed", pa.array([bool(fb.get("failed")) for fb in feedback], pa.bool_()))
+        add("limit", pa.array([fb.get("limit") for fb in feedback], pa.string()))
+
+    info = {k: meta[k] for k in _META_FIELDS if k in meta}
+    info["schema_version"] = SCHEMA_VERSION
+    metadata = {META_KEY: json.dumps(info, ensure_ascii=False).encode("utf-8")}
+    return pa.Table.from_arrays(columns, schema=pa.schema(fields, metadata=metadata))
+
+
+def write_run(path, df, feedback, meta):
+    """Write a run's Parquet file (via a temp file, so readers never see half of it)"""
+    import pyarrow.parquet as pq
+
+    path = Path(path)
+    tmp = path.with_name(path.name + ".tmp")
+    pq.write_table(run_table(df, feedback, meta), tmp, compression="zstd")
+    os.replace(tmp, path)
+    return path
+
+
+def read_run(path, columns=None):
+    """pyarrow Table of one run's Parquet file, memory-mapped; columns limits what is read"""
+    import pyarrow.parquet as pq
+    return pq.read_table(path, columns=columns, memory_map=True)
+
+
+def read_meta(path):
+    """The run meta stored in a Parquet file's footer (no data is read)"""
+    import pyarrow.parquet as pq
+    metadata = pq.read_schema(path, memory_map=True).metadata or {}
+    return json.loads(metadata.get(META_KEY, b"{}"))
+
+
+def run_files(runs_root):
+    """Parquet file of every stored run, in run id order"""
+    return sorted(Path(runs_root).glob("*/*.parquet"))
+
+
+def read_runs(runs_root, columns=None, module=None, course=None):
+    """
+    One pyarrow Table over many runs, for reporting
+    Runs graded against different rubrics have different criterion
+    columns; they are all included, null where a run doesn't have them
+    module / course filter rows before anything is materialized
+    """
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+
+    files = [str(p) for p in run_files(runs_root)]
+    if not files:
+        return pa.table({})
+    # Categorical columns are plain strings across runs (each file has its own dictionary)
+    schema = pa.unify_schemas([pq.read_schema(f, memory_map=True).remove_metadata() for f in files])
+    schema = pa.schema([pa.field(f.name, f.type.value_type) if pa.types.is_dictionary(f.type) else f
+                        for f in schema])
+    condition = None
+    for name, value in (("module", module), ("course", course)):
+        if value is not None:
+            test = ds.field(name) == value
+            condition = test if condition is None else condition & test
+    return ds.dataset(files, schema=schema, format="parquet").to_table(columns=columns, filter=condition)
+
+
+def export_missing(runs_root):
+    """Write the Parquet file of every stored run that doesn't have one; returns how many"""
+    from runs import load_run, run_dir, update_meta
+
+    count = 0
+    for meta_path in sorted(Path(runs_root).glob("*/meta.json")):
+        run_id = meta_path.parent.name
+        folder = run_dir(runs_root, run_id)
+        if folder is None or any(folder.glob("*.parquet")):
+            continue
+        context = load_run(runs_root, run_id)
+        filename = parquet_filename(context["module"])
+        meta = {k: v for k, v in context.items() if k not in ("df", "feedback")}
+        write_run(folder / filename, context["df"], context["feedback"], meta)
+        update_meta(runs_root, run_id, parquet_filename=filename)
+        count += 1
+    return count
+
+
+if __name__ == "__main__":
+    if not available():
+        sys.exit("columnar.py needs pyarrow (pip install pyarrow)")
+    root = sys.argv[1] if len(sys.argv) > 1 else os.path.join("uploads", "runs")
+    print(f"Exported {export_missing(root)} runs to Parquet")
@@ -1,4 +1,7 @@
+from typing import List
+
 from fastapi import FastAPI
+from pydantic import BaseModel
 
 app = FastAPI()
 
@@ -15,4 +18,14 @@ EXPLANATIONS = {
 
 @app.get("/explain/{key}")
 def explain(key: str):
-    return {"explanation": EXPLANATIONS.get(key, "No explanation.")}
\ No newline at end of file
+    return {"explanation": EXPLANATIONS.get(key, "No explanation.")}
+
+
+class ExplainRequest(BaseModel):
+    keys: List[str]
+
+
+@app.post("/explain")
+def explain_many(req: ExplainRequest):
+    """Resolve many keys in one call so a grading run needs one round trip"""
+    return {"explanations": {key: EXPLANATIONS.get(key, "No explanation.") for key in req.keys}}
\ No newline at end of file
@@ -1,92 +1,126 @@
-import matplotlib
-matplotlib.use("Agg")   # 🔥 Required for EXE, Flask, server-safe image generation
-
 """
 Excel export module for M7Pro Grader
 Creates Excel file with:
 - Sheet 1: Results DataFrame (all grades)
 - Sheet 2: Plots (both charts as per wireframe)
+- Sheet 3: Feedback (one row per student)
+- Sheet 4: Similarity (near-duplicate pairs, when checked)
+The workbook is written in openpyxl's write-only mode: rows are streamed
+to the file as they are added, so memory stays flat for large cohorts
 """
 import io
-import pandas as pd
-import matplotlib.pyplot as plt
+import os
+
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
 from openpyxl.drawing.image import Image
+from openpyxl.styles import Font
+
+from charts import render_charts
+from timing import stage
+
+# Blank rows between the two charts on the plots sheet (chart 2 starts at A36)
+_CHART_GAP_ROWS = 31
+
+
+def _clean(value):
+    """Strip characters that aren't allowed in an XLSX cell"""
+    if isinstance(value, str):
+        return ILLEGAL_CHARACTERS_RE.sub("", value)
+    return value
 
 
-def make_excel_from_df(df, module, feedback):
+def _header(ws, names):
+    cells = []
+    for name in names:
+        cell = WriteOnlyCell(ws, value=name)
+        cell.font = Font(bold=True)
+        cells.append(cell)
+    return cells
+
+
+def write_excel(target, df, module, feedback, charts=None, similarity=None):
+    """
+    Stream the results workbook to target (a file path or a binary file object)
+    charts: PNG bytes from charts.render_charts (rendered here if not given)
+    similarity: report from similarity.find_similar (sheet skipped if None)
+    """
+    wb = Workbook(write_only=True)
+
+    # Sheet 1: Results DataFrame
+    with stage("excel.results"):
+        ws = wb.create_sheet("results")
+        ws.append(_header(ws, list(df.columns)))
+        for row in df.itertuples(index=False, name=None):
+            ws.append([_clean(v) for v in row])
+
+    # Sheet 2: Plots (TWO charts)
+    ws = wb.create_sheet("plots")
+    title = WriteOnlyCell(ws, value=f"M7Pro Grader - {module} - Dashboard Visualizations")
+    title.font = Font(bold=True, size=14)
+    ws.append([title])
+
+    # Charts are rendered once per run and shared with the web page
+    if charts is None:
+        with stage("charts"):
+            charts = render_charts(df, module)
+
+    # CHART 1: Average criteria scores
+    if charts["plot_criteria"]:
+        ws.add_image(Image(io.BytesIO(charts["plot_criteria"])), "A3")
+
+    # CHART 2: Grade 1 distribution
+    for _ in range(_CHART_GAP_ROWS):
+        ws.append([])
+    ws.append(["📉 Bar Chart - Students with Grade 1"])                                   # A33
+    ws.append(["Number and percentage of students who received a failing grade (1)"])  # A34
+    ws.add_image(Image(io.BytesIO(charts["plot_grade1"])), "A36")
+
+    # Sheet 3: Per-student feedback
+    with stage("excel.feedback"):
+        criteria = [c for c in df.columns if c not in ["file", "total_grade"]]
+        ws = wb.create_sheet("feedback")
+        ws.append(_header(ws, ["file", "total_grade", "failed", "general", *criteria]))
+        for fb in feedback:
+            notes = fb.get("feedback", {})
+            ws.append([
+                _clean(fb.get("file")),
+                fb.get("total_grade"),
+                fb.get("failed"),
+                _clean(notes.get("general", "")),
+                *[_clean(notes.get(c, "")) for c in criteria],
+            ])
+
+    # Sheet 4: Near-duplicate submissions
+    if similarity is not None:
+        ws = wb.create_sheet("similarity")
+        ws.append(_header(ws, ["file", "similar_to", "similarity", "earlier_run", "earlier_course"]))
+        for p in similarity["pairs"]:
+            ws.append([
+                _clean(p["file"]),
+                _clean(p["other_file"]),
+                p["similarity"],
+                p["other_run"] or "",
+                _clean(p["other_course"] or ""),
+            ])
+
+    with stage("excel.save"):
+        if isinstance(target, (str, os.PathLike)):
+            # Write next to the target and rename, so a half-written file is never served
+            tmp = f"{os.fspath(target)}.tmp"
+            wb.save(tmp)
+            os.replace(tmp, target)
+        else:
+            wb.save(target)
+
+
+def make_excel_from_df(df, module, feedback, charts=None, similarity=None):
     """
     Create Excel file with results in one sheet and plots in another sheet
     As per wireframe requirements
+    Returns the workbook as bytes - use write_excel to stream to a file instead
     """
     output = io.BytesIO()
-
-    with pd.ExcelWriter(output, engine="openpyxl") as writer:
-        # Sheet 1: Results DataFrame
-        df.to_excel(writer, sheet_name="results", index=False)
-
-        # Sheet 2: Plots (TWO charts)
-        wb = writer.book
-        wb.create_sheet("plots")
-        ws = wb["plots"]
-        
-        ws['A1'] = f"M7Pro Grader - {module} - Dashboard Visualizations"
-        ws['A1'].font = ws['A1'].font.copy(bold=True, size=14)
-        
-        # CHART 1: Average criteria scores
-        cols = [c for c in df.columns if c not in ["file", "total_grade"]]
-        if cols:
-            plt.figure(figsize=(7, 4))
-            colors = ['#4CAF50', '#2196F3', '#FF9800', '#9C27B0', '#F44336']
-            df[cols].mean().plot(kind="bar", color=colors[:len(cols)], edgecolor='black', linewidth=1.2)
-            plt.title(f"{module} - Average Scores by Criteria", fontsize=14, fontweight='bold')
-            plt.ylabel("Weighted Score (0-100)", fontsize=11)
-            plt.xlabel("Criteria", fontsize=11)
-            plt.xticks(rotation=45, ha='right')
-            plt.grid(axis='y', alpha=0.3)
-            plt.tight_layout()
-
-            img1 = io.BytesIO()
-            plt.savefig(img1, format="png", dpi=110)
-            plt.close()
-            img1.seek(0)
-
-            ws.add_image(Image(img1), "A3")
-        
-        # CHART 2: Grade 1 distribution
-        grade_1_count = (df["total_grade"] == 1).sum()
-        other_count = len(df) - grade_1_count
-        total_students = len(df)
-        
-        grade_1_pct = (grade_1_count / total_students * 100) if total_students > 0 else 0
-        other_pct = (other_count / total_students * 100) if total_students > 0 else 0
-        
-        plt.figure(figsize=(7, 4))
-        categories = ['Grade = 1\n(Failed)', 'Other Grades\n(Passed)']
-        counts = [grade_1_count, other_count]
-        colors_bar = ['#ef4444', '#10b981']
-        
-        bars = plt.bar(categories, counts, color=colors_bar, edgecolor='black', linewidth=1.2, alpha=0.8)
-        
-        for bar, count, pct in zip(bars, counts, [grade_1_pct, other_pct]):
-            height = bar.get_height()
-            plt.text(bar.get_x() + bar.get_width()/2., height,
-                    f'{count} students\n({pct:.1f}%)',
-                    ha='center', va='bottom', fontsize=10, fontweight='bold')
-        
-        plt.title(f"{module} - Students with Grade 1 vs Other Grades", fontsize=14, fontweight='bold')
-        plt.ylabel("Number of Students", fontsize=11)
-        plt.grid(axis='y', alpha=0.3)
-        plt.tight_layout()
-
-        img2 = io.BytesIO()
-        plt.savefig(img2, format="png", dpi=110)
-        plt.close()
-        img2.seek(0)
-
-        ws['A33'] = "📉 Bar Chart - Students with Grade 1"
-        ws['A34'] = "Number and percentage of students who received a failing grade (1)"
-
-        ws.add_image(Image(img2), "A36")
-
-    output.seek(0)
+    write_excel(output, df, module, feedback, charts, similarity)
     return output.getvalue()
@@ -0,0 +1,82 @@
+"""
+Client for the optional dictionary_api explanation service
+- One pooled HTTP session for every lookup
+- Bulk lookups: a whole grading run resolves its keys in one request
+- In-process memo with a TTL
+- Circuit breaker: after a failure the API is skipped for a while and
+  the local explanations are used instead
+requests is only imported when the first lookup is made
+"""
+import threading
+import time
+
+
+class ExplainClient:
+    """Explanation lookups against dictionary_api with local fallback"""
+
+    def __init__(self, base_url, fallback, timeout=1.2, ttl=600, cooldown=60):
+        self.url = base_url.rstrip("/")
+        self.fallback = fallback
+        self.timeout = timeout
+        self.ttl = ttl
+        self.cooldown = cooldown
+
+        self._session = None
+        self._memo = {}
+        self._open_until = 0.0   # circuit is open (API skipped) until this time
+        self._lock = threading.Lock()
+
+    def _get_session(self):
+        import requests
+        from requests.adapters import HTTPAdapter
+        with self._lock:
+            if self._session is None:
+                session = requests.Session()
+                session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=8))
+                session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=8))
+                self._session = session
+            return self._session
+
+    def _fetch(self, keys):
+        """One bulk request; returns {key: explanation} or None on any failure"""
+        import requests
+        with self._lock:
+            if time.time() < self._open_until:
+                return None
+        try:
+            r = self._get_session().post(self.url, json={"keys": keys}, timeout=self.timeout)
+            if r.status_code == 200:
+                return r.json()["explanations"]
+        except (requests.RequestException, ValueError, KeyError):
+            pass
+        # Trip the breaker so the rest of the run doesn't wait on timeouts
+        with self._lock:
+            self._open_until = time.time() + self.cooldown
+        return None
+
+    def explain_many(self, keys):
+        """Return {key: explanation} for every key, using at most one request"""
+        now = time.time()
+        found = {}
+        missing = []
+        with self._lock:
+            for key in dict.fromkeys(keys):
+                hit = self._memo.get(key)
+                if hit and hit[0] > now:
+                    found[key] = hit[1]
+                else:
+                    missing.append(key)
+
+        if missing:
+            fetched = self._fetch(missing) or {}
+            expires = time.time() + self.ttl
+            with self._lock:
+                for key, text in fetched.items():
+                    self._memo[key] = (expires, text)
+            for key in missing:
+                found[key] = fetched.get(key) or self.fallback(key)
+        return found
+
+    def explain(self, key):
+        """Single-key lookup"""
+        return self.explain_many([key])[key]
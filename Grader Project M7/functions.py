@@ -4,6 +4,136 @@ Used by grader.py to evaluate student code
 """
 import ast
 import re
+import warnings
+from collections import namedtuple
+
+
+# Compact record of everything the grader needs to know about one file
+SourceAnalysis = namedtuple("SourceAnalysis", [
+    "valid_syntax",
+    "has_while_true",
+    "comment_count",
+    "assignment_count",
+    "input_calls",
+    "print_calls",
+    "collection_count",
+    "decision_count",
+    "function_count",
+    "for_count",
+    "while_count",
+    "line_count",
+])
+
+# One pass over the source finds everything the grader counts.
+# Strings and comments are matched as whole units first, so keywords
+# and calls that only appear inside them are never counted
+# The counts match the tokenize-based analyzer this replaced: while (
+# True) and input (...) across lines are caught, while 1.5 isn't, 1if x
+# has an if (keywords may follow a number directly), and an unterminated
+# triple-quoted string is no comment (the tokenizer stopped there)
+_SCAN = re.compile(r"""
+    (?P<comment>\#[^\r\n]*)
+  | (?P<string>(?<!\w)[rRbBuUfF]{0,2}
+        (?: "{3}(?:[^"\\]|\\.|"(?!""))*(?:(?P<tq_d>"{3})|\Z)
+          | '{3}(?:[^'\\]|\\.|'(?!''))*(?:(?P<tq_s>'{3})|\Z)
+          | "(?:[^"\\\n]|\\.)*"?
+          | '(?:[^'\\\n]|\\.)*'?
+        ))
+  | (?P<while_true>(?:\b|(?<=\d))while(?:[ \t]|\\\r?\n)*(?:\((?:\s|\\\r?\n)*)*(?:True|1)(?![\w.]))
+  | (?P<word>(?:\b|(?<=\d))(?:while|for|if|elif|else|def)\b
+        |\b(?:input|print)(?=(?:\s|\\|\#[^\r\n]*)*\())
+  | (?P<op>==|!=|<=|>=|:=|\*\*=|//=|>>=|<<=|[-+*/%&|^@]=|=|[\[{])
+""", re.VERBOSE | re.DOTALL)
+
+
+def _parses(src):
+    """True if the code parses (return at module level and the like still count as valid)"""
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")   # e.g. invalid escape sequences
+            ast.parse(src)
+        return True
+    except Exception:
+        return False
+
+
+def _inside_name(src, start):
+    """True if a keyword found at start is really the end of a name like x1if"""
+    if not start or not src[start - 1].isdigit():
+        return False
+    i = start - 1
+    while i > 0 and (src[i - 1].isalnum() or src[i - 1] == "_"):
+        i -= 1
+    return not src[i].isdigit()
+
+
+def analyze_source(src):
+    """
+    Scan and parse the code ONCE and collect every metric the grader uses
+    Keywords and calls are matched outside strings and comments only
+    Returns a SourceAnalysis record
+    """
+    has_while_true = False
+    comment_count = 0
+    assignment_count = 0
+    input_calls = 0
+    print_calls = 0
+    collection_count = 0
+    decision_count = 0
+    function_count = 0
+    for_count = 0
+    while_count = 0
+
+    for m in _SCAN.finditer(src):
+        kind = m.lastgroup
+        text = m.group()
+
+        if kind == "comment":
+            # Only whole-line comments count as pseudocode
+            start = m.start()
+            if not src[src.rfind("\n", 0, start) + 1:start].strip():
+                comment_count += 1
+        elif kind == "string":
+            # Docstrings / triple-quoted blocks (closed ones only)
+            if m.group("tq_d") or m.group("tq_s"):
+                comment_count += 1
+        elif kind == "op":
+            if text == "=":
+                assignment_count += 1
+            elif text in "[{":
+                collection_count += 1
+        elif not _inside_name(src, m.start()):
+            if kind == "while_true":
+                # while True / while 1 / while(True) / while (1)
+                has_while_true = True
+                text = "while"
+            if text == "while":
+                while_count += 1
+            elif text == "for":
+                for_count += 1
+            elif text == "def":
+                function_count += 1
+            elif text == "input":
+                input_calls += 1
+            elif text == "print":
+                print_calls += 1
+            else:
+                decision_count += 1
+
+    return SourceAnalysis(
+        valid_syntax=_parses(src),
+        has_while_true=has_while_true,
+        comment_count=comment_count,
+        assignment_count=assignment_count,
+        input_calls=input_calls,
+        print_calls=print_calls,
+        collection_count=collection_count,
+        decision_count=decision_count,
+        function_count=function_count,
+        for_count=for_count,
+        while_count=while_count,
+        line_count=len(src.split('\n')),
+    )
 
 
 def safe_parse_python(src):
@@ -11,11 +141,7 @@ def safe_parse_python(src):
     Check if Python code has valid syntax
     Returns True if code can be parsed, False otherwise
     """
-    try:
-        ast.parse(src)
-        return True
-    except:
-        return False
+    return analyze_source(src).valid_syntax
 
 
 def contains_while_true(src):
@@ -23,20 +149,7 @@ def contains_while_true(src):
     Detect if code contains 'while True' or 'while 1' loops
     Returns True if found (which is not allowed per requirements)
     """
-    # Convert to lowercase for case-insensitive matching
-    s = src.lower()
-    
-    # Check for various forms of infinite loops
-    patterns = [
-        "while true",
-        "while 1",
-        "while(true)",
-        "while(1)",
-        "while 1:",
-        "while true:"
-    ]
-    
-    return any(pattern in s for pattern in patterns)
+    return analyze_source(src).has_while_true
 
 
 def count_comments(src):
@@ -44,14 +157,8 @@ def count_comments(src):
     Count the number of comment lines in code
     Used to evaluate pseudocode/documentation
     """
-    # Count lines that start with # (after stripping whitespace)
-    lines = src.split('\n')
-    comment_count = sum(1 for line in lines if line.strip().startswith('#'))
-    
-    # Also count docstrings
-    docstring_count = src.count('"""') // 2 + src.count("'''") // 2
-    
-    return comment_count + docstring_count
+    # Whole-line comments plus docstrings
+    return analyze_source(src).comment_count
 
 
 def count_assignments(src):
@@ -59,110 +166,95 @@ def count_assignments(src):
     Count variable assignments in code
     Used to evaluate proper use of variables
     """
-    # Pattern matches variable assignments (basic form)
-    # Looks for: word = something
-    pattern = r'\b\w+\s*=\s*'
-    assignments = re.findall(pattern, src)
-    
-    # Filter out comparison operators (==, !=, <=, >=)
-    valid_assignments = [a for a in assignments if not any(op in a for op in ['==', '!=', '<=', '>='])]
-    
-    return len(valid_assignments)
+    # Every '=' operator token (==, !=, <=, >= are separate tokens)
+    return analyze_source(src).assignment_count
 
 
 def has_input_call(src):
     """
     Check if code contains input() function calls
     """
-    return "input(" in src
+    return analyze_source(src).input_calls > 0
 
 
 def has_print_call(src):
     """
     Check if code contains print() function calls
     """
-    return "print(" in src
+    return analyze_source(src).print_calls > 0
 
 
 def has_list_or_dict(src):
     """
     Check if code uses lists or dictionaries
-    Looks for [ ] or { } characters
+    Looks for [ ] or { } brackets
     """
-    # Check for list literals
-    has_list = "[" in src and "]" in src
-    
-    # Check for dictionary literals
-    has_dict = "{" in src and "}" in src
-    
-    return has_list or has_dict
+    return analyze_source(src).collection_count > 0
 
 
 def has_decision_structure(src):
     """
     Check if code contains decision structures (if/elif/else)
     """
-    keywords = ["if ", "elif ", "else"]
-    return any(keyword in src for keyword in keywords)
+    return analyze_source(src).decision_count > 0
 
 
 def has_loop_or_structure(src):
     """
     Check if code contains loops (for/while) or decision structures
     """
-    s = src.lower()
-    keywords = ["for ", "while ", "if "]
-    return any(keyword in s for keyword in keywords)
+    a = analyze_source(src)
+    return a.for_count + a.while_count + a.decision_count > 0
 
 
 def has_function_def(src):
     """
     Check if code defines at least one function
     """
-    return "def " in src
+    return analyze_source(src).function_count > 0
 
 
 def count_functions(src):
     """
     Count the number of function definitions in code
     """
-    return src.count("def ")
+    return analyze_source(src).function_count
 
 
 def has_loop(src):
     """
     Check if code contains any loop structure
     """
-    s = src.lower()
-    return "for " in s or "while " in s
+    a = analyze_source(src)
+    return a.for_count + a.while_count > 0
 
 
 def count_loops(src):
     """
     Count the number of loop structures
     """
-    s = src.lower()
-    for_count = s.count("for ")
-    while_count = s.count("while ")
-    return for_count + while_count
+    a = analyze_source(src)
+    return a.for_count + a.while_count
 
 
-def get_code_metrics(src):
+def get_code_metrics(src, analysis=None):
     """
     Return a dictionary of various code metrics
     Useful for detailed analysis
+    Pass an existing analysis to avoid analyzing the code again
     """
+    a = analysis or analyze_source(src)
     return {
-        'valid_syntax': safe_parse_python(src),
-        'has_while_true': contains_while_true(src),
-        'comment_count': count_comments(src),
-        'assignment_count': count_assignments(src),
-        'has_input': has_input_call(src),
-        'has_print': has_print_call(src),
-        'has_collections': has_list_or_dict(src),
-        'has_decisions': has_decision_structure(src),
-        'has_loops': has_loop(src),
-        'function_count': count_functions(src),
-        'loop_count': count_loops(src),
-        'line_count': len(src.split('\n'))
+        'valid_syntax': a.valid_syntax,
+        'has_while_true': a.has_while_true,
+        'comment_count': a.comment_count,
+        'assignment_count': a.assignment_count,
+        'has_input': a.input_calls > 0,
+        'has_print': a.print_calls > 0,
+        'has_collections': a.collection_count > 0,
+        'has_decisions': a.decision_count > 0,
+        'has_loops': a.for_count + a.while_count > 0,
+        'function_count': a.function_count,
+        'loop_count': a.for_count + a.while_count,
+        'line_count': a.line_count
     }
\ No newline at end of file
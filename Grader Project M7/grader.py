@@ -1,26 +1,36 @@
+import copy
+import hashlib
 import os
-import pandas as pd
+import posixpath
+import zipfile
+from budget import Limit, guarded_map
 from functions import *
+import rubrics
+from score_cache import make_key
+from sandbox import output_similarity
+from timing import stage
 
-# CRITERIA MAP - EXACTLY as per module_criterias-1.docx
-CRITERIA_MAP = {
-    "M1": {"input": 30, "output": 50, "pseudocode": 10, "variables": 5},
-    "M2": {"input": 10, "output": 30, "List or Dictionary": 45, "pseudocode": 10, "variables": 5},
-    "M3": {"input": 15, "decision structure": 25, "output": 45, "pseudocode": 10, "variables": 5},
-    "M4": {"structure(loops and decision structures)": 40, "output": 40, "pseudocode": 5, "variables": 5},
-    "M5": {"structure(loops and decision structures)": 30, "output": 50, "functions": 10, "pseudocode": 5, "variables": 5}
-}
+# Bump whenever scoring changes so cached scores from older versions are ignored
+GRADER_VERSION = "5"
+
+# Module rubrics (weights) and missing-criterion feedback, loaded from
+# rubrics/*.json and kept current when those files are edited (see rubrics.py)
+CRITERIA_MAP = rubrics.CRITERIA_MAP
+LOCAL_EXPLAIN = rubrics.LOCAL_EXPLAIN
+
+# Below this many files grade_folder stays serial even when workers > 1
+PARALLEL_MIN_FILES = 32
+
+# Zip bomb protection for grade_zip
+ZIP_MAX_MEMBER_BYTES = 10 * 1024 * 1024     # one .py file
+ZIP_MAX_TOTAL_BYTES = 512 * 1024 * 1024     # all .py files together
+ZIP_MAX_RATIO = 100                         # uncompressed / compressed size
+ZIP_RATIO_MIN_BYTES = 1024 * 1024           # small files may compress very well
+
+
+class ZipLimitError(ValueError):
+    """Raised when a submissions ZIP goes over one of the size limits"""
 
-LOCAL_EXPLAIN = {
-    "input": "🔌 Missing or incorrect input() usage - Your program needs to accept user input!",
-    "output": "🖨️ Output (print) missing or incomplete - Make sure to display results to the user!",
-    "pseudocode": "💬 Add comments describing your logic - Help others understand your code!",
-    "variables": "🔤 Use more variables / better naming - Clear variable names improve readability!",
-    "List or Dictionary": "📚 Collections not used where required - Lists or dictionaries are needed here!",
-    "decision structure": "🔀 Missing if/elif/else branching - Add conditional logic to handle different cases!",
-    "structure(loops and decision structures)": "🔄 Missing loop or structure logic - Use loops and decisions together!",
-    "functions": "🔧 You must define at least one function - Break your code into reusable pieces!"
-}
 
 def get_local_explanation(key):
     return LOCAL_EXPLAIN.get(key, "❌ No explanation available.")
@@ -38,9 +48,52 @@ def _auto_fail(reason, criteria, content):
     }
 
 
-def _score(content, criteria):
+# Feedback for files that went over a per-file resource budget (see budget.py)
+LIMIT_FEEDBACK = {
+    "size": "📦 RESOURCE LIMIT: FILE TOO LARGE 📦\n\n"
+            "This file ({detail}) is over the grader's size limit, so it was not analyzed. "
+            "Submit only the program you wrote - no generated or pasted data.\n\n"
+            "Grade: 1/100 - Please ask your instructor to review this submission 🔍",
+    "time": "⏱️ RESOURCE LIMIT: ANALYSIS TIMED OUT ⏱️\n\n"
+            "Analyzing this file took too long ({detail}), so it was stopped.\n\n"
+            "Grade: 1/100 - Please ask your instructor to review this submission 🔍",
+    "memory": "🧠 RESOURCE LIMIT: OUT OF MEMORY 🧠\n\n"
+              "Analyzing this file needed more memory than the grader allows ({detail}).\n\n"
+              "Grade: 1/100 - Please ask your instructor to review this submission 🔍",
+    "error": "💥 RESOURCE LIMIT: ANALYSIS FAILED 💥\n\n"
+             "The grader could not analyze this file ({detail}).\n\n"
+             "Grade: 1/100 - Please ask your instructor to review this submission 🔍",
+}
+
+
+def _limit_result(limit, criteria, content=""):
+    """Grade-1 result for a file that went over budget; result["limit"] says which budget"""
+    result = _auto_fail(LIMIT_FEEDBACK[limit.kind].format(detail=limit.detail), criteria, content)
+    result["limit"] = limit.kind
+    return result
+
+
+def _reusable_result(result):
+    """Stored results can be reused unless they came from a resource limit (those depend on load)"""
+    return "limit" not in result
+
+
+def _criterion_feedback(crit, val):
+    """Feedback line for one criterion's raw 0-100 score"""
+    return rubrics.feedback(crit, val)
+
+
+def scoring_version(criteria):
+    """Version stored with cached scores: the grader's plus the rubric rules for these criteria"""
+    return f"{GRADER_VERSION}:{rubrics.fingerprint(criteria)}"
+
+
+def _score(content, criteria, analysis=None):
+    # Scan + compile the file once; every check below reads from this record
+    a = analysis or analyze_source(content)
+
     # Check for while True first - immediate fail with grade 1
-    if contains_while_true(content):
+    if a.has_while_true:
         return _auto_fail(
             "🚫 WHILE TRUE DETECTED! 🚫\n\n"
             "Whoa there, cowboy! 🤠 Your code contains 'while True' which creates an infinite loop. "
@@ -52,7 +105,7 @@ def _score(content, criteria):
         )
     
     # Check for syntax errors - program crashes
-    if not safe_parse_python(content):
+    if not a.valid_syntax:
         return _auto_fail(
             "❌ PROGRAM CRASHED! ❌\n\n"
             "Houston, we have a problem! 🚀 Your program has a syntax error and crashed. "
@@ -62,30 +115,11 @@ def _score(content, criteria):
             content
         )
 
-    # Calculate raw scores for each criterion
-    raw = {
-        "input": 100 if has_input_call(content) else 0,
-        "output": 100 if has_print_call(content) else 0,
-        "pseudocode": min(count_comments(content) * 10, 100),
-        "variables": min(count_assignments(content) * 10, 100),
-        "List or Dictionary": 100 if has_list_or_dict(content) else 0,
-        "decision structure": 100 if has_decision_structure(content) else 0,
-        "structure(loops and decision structures)": 100 if has_loop_or_structure(content) else 0,
-        "functions": 100 if has_function_def(content) else 0
-    }
+    # Raw 0-100 scores, only for this module's criteria
+    raw = rubrics.evaluator(criteria)(a)
 
     # Generate feedback ONLY for criteria in this module
-    feedback = {}
-    for crit in criteria.keys():
-        val = raw.get(crit, 0)
-        if val == 0:
-            feedback[crit] = LOCAL_EXPLAIN.get(crit, "❌ Missing requirement")
-        elif val < 50:
-            feedback[crit] = f"⚠️ Needs improvement - Score: {val}/100"
-        elif val < 80:
-            feedback[crit] = f"👍 Good work! - Score: {val}/100"
-        else:
-            feedback[crit] = f"✅ Excellent! - Score: {val}/100"
+    feedback = {crit: _criterion_feedback(crit, raw.get(crit, 0)) for crit in criteria.keys()}
 
     # Calculate weighted scores ONLY for this module's criteria
     weighted = {crit: round(raw[crit] * w / 100, 2) for crit, w in criteria.items()}
@@ -105,37 +139,93 @@ def _score(content, criteria):
     }
 
 
-def grade_folder(folder_path, criteria):
-    """Grade all Python files in the specified folder"""
+def _iter_python_files(folder_path):
+    """
+    Yield every .py file under the folder in a stable walk order:
+    a folder's files (sorted) come before its sub-folders (sorted)
+    """
+    for root, dirs, files in os.walk(folder_path):
+        dirs.sort()
+        for f in sorted(files):
+            if f.endswith(".py"):
+                yield os.path.join(root, f)
+
+
+def _walk_order_key(member_name):
+    """Sort key that puts ZIP member paths in the same order as _iter_python_files"""
+    parts = [p for p in member_name.replace("\\", "/").split("/") if p]
+    # Files (0) sort before sub-folders (1) at the same level
+    return [(1, p) for p in parts[:-1]] + [(0, parts[-1])]
+
+
+def _decode_source(data):
+    """
+    Decode submission bytes the same way open(..., encoding="utf-8") reads them,
+    including newline translation; undecodable files grade as empty
+    """
+    try:
+        text = data.decode("utf-8")
+    except UnicodeDecodeError:
+        return ""
+    return text.replace("\r\n", "\n").replace("\r", "\n")
+
+
+def _read_source(path):
+    """Read a submission as text; unreadable files grade as empty"""
+    try:
+        with open(path, "rb") as fh:
+            return _decode_source(fh.read())
+    except OSError:
+        return ""
+
+
+class _WithRubrics:
+    """
+    func(item, criteria=criteria) that also works in worker processes: it
+    carries the rubric rules of the process that created it, and installs
+    them the first time it runs in another process
+    """
+
+    def __init__(self, func, criteria):
+        self.func = func
+        self.criteria = criteria
+        self.rules = rubrics.snapshot(criteria)
+        self.pid = os.getpid()
+        self.installed = False
+
+    def __call__(self, item):
+        if not self.installed and os.getpid() != self.pid:
+            rubrics.install(self.rules)
+            self.installed = True
+        return self.func(item, criteria=self.criteria)
+
+
+def _grade_path(path, criteria):
+    """Read and score one file (also runs inside the worker processes)"""
+    result = _score(_read_source(path), criteria)
+    result["file"] = os.path.basename(path)
+    return result
+
+
+def _build_results(results, criteria):
+    """Turn the per-file results into the (DataFrame, feedback) pair"""
+    import pandas as pd   # heavy - loaded on the first grading run, not at startup
+
     rows = []
     feedback = []
 
-    python_files_found = False
-    
-    for root, _, files in os.walk(folder_path):
-        for f in files:
-            if f.endswith(".py"):
-                python_files_found = True
-                path = os.path.join(root, f)
-                try:
-                    content = open(path, "r", encoding="utf-8").read()
-                except:
-                    content = ""
-
-                result = _score(content, criteria)
-                result["file"] = f
-
-                # Build row for DataFrame
-                row = {
-                    "file": f,
-                    **{k: result[k] for k in criteria},
-                    "total_grade": result["total_grade"]
-                }
-                rows.append(row)
-                feedback.append(result)
+    for result in results:
+        # Build row for DataFrame
+        row = {
+            "file": result["file"],
+            **{k: result[k] for k in criteria},
+            "total_grade": result["total_grade"]
+        }
+        rows.append(row)
+        feedback.append(result)
 
     # Handle case where no Python files are found
-    if not python_files_found:
+    if not rows:
         empty_row = {
             "file": "No files found",
             **{k: 0 for k in criteria},
@@ -152,4 +242,361 @@ def grade_folder(folder_path, criteria):
         })
 
     df = pd.DataFrame(rows)
-    return df, feedback
\ No newline at end of file
+    return df, feedback
+
+
+def _path_size(path):
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def _pool_map(func, items, workers, chunksize, progress=None, size=len):
+    """
+    Map func over items, in order, using worker processes when it's worth it
+    workers=None means one worker per CPU
+    Every item runs under the per-file budgets (see budget.py); an item
+    that goes over one comes back as a budget.Limit
+    progress(n) is called with the number of items finished so far
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    # Small batches aren't worth the cost of starting worker processes
+    if workers > 1 and len(items) >= PARALLEL_MIN_FILES:
+        if chunksize is None:
+            # A few chunks per worker keeps them busy without paying
+            # inter-process overhead for every single small file
+            chunksize = max(1, len(items) // (workers * 4))
+    else:
+        workers, chunksize = 1, 1
+    return guarded_map(func, items, workers, chunksize, progress, size)
+
+
+def _score_sources(sources, criteria, workers=1, chunksize=None, cache=None, progress=None):
+    """
+    Score a list of (file name, content) pairs in order
+    Files already in the cache are not rescored
+    progress(done, total) is called as files are finished
+    """
+    total = len(sources)
+    cached = {}
+    keys = []
+    if cache is not None:
+        with stage("cache.get"):
+            version = scoring_version(criteria)
+            keys = [make_key(content, criteria, version) for _, content in sources]
+            cached = cache.get_many(keys)
+
+    todo = [i for i in range(total) if not keys or keys[i] not in cached]
+    done_before = total - len(todo)
+    if progress:
+        progress(done_before, total)
+    with stage("score"):
+        scored = _pool_map(_WithRubrics(_score, criteria),
+                           [sources[i][1] for i in todo], workers, chunksize,
+                           progress and (lambda n: progress(done_before + n, total)))
+    scored = [_limit_result(r, criteria, sources[i][1]) if isinstance(r, Limit) else r
+              for i, r in zip(todo, scored)]
+
+    if cache is not None:
+        with stage("cache.put"):
+            cache.put_many({keys[i]: result for i, result in zip(todo, scored) if _reusable_result(result)})
+
+    fresh = dict(zip(todo, scored))
+    results = []
+    for i, (name, _) in enumerate(sources):
+        # Copy cached results - the same file may appear more than once
+        result = fresh[i] if i in fresh else copy.deepcopy(cached[keys[i]])
+        result["file"] = name
+        results.append(result)
+    return results
+
+
+def grade_folder(folder_path, criteria, workers=1, chunksize=None, cache=None, progress=None):
+    """
+    Grade all Python files in the specified folder
+    workers > 1 (or None for one per CPU) spreads reading and scoring
+    across a process pool; results always come back in the same order
+    as the serial walk
+    cache (a ScoreCache) skips rescoring files that were graded before
+    progress(done, total) is called as files are finished
+    """
+    paths = list(_iter_python_files(folder_path))
+
+    if cache is not None:
+        # Content is needed up front to look files up in the cache
+        with stage("read"):
+            sources = [(os.path.basename(p), _read_source(p)) for p in paths]
+        results = _score_sources(sources, criteria, workers, chunksize, cache, progress)
+    else:
+        # Files are read inside the workers, so reading counts as scoring here
+        with stage("score"):
+            results = _pool_map(_WithRubrics(_grade_path, criteria), paths, workers, chunksize,
+                                progress and (lambda n: progress(n, len(paths))), size=_path_size)
+        for i, r in enumerate(results):
+            if isinstance(r, Limit):
+                results[i] = {**_limit_result(r, criteria), "file": os.path.basename(paths[i])}
+
+    return _build_results(results, criteria)
+
+
+def _zip_members(z):
+    """
+    The .py members of an open ZIP, in the order grade_folder would visit
+    the extracted files; raises ZipLimitError before anything large is
+    decompressed
+    """
+    members = [i for i in z.infolist() if not i.is_dir() and i.filename.endswith(".py")]
+    members.sort(key=lambda i: _walk_order_key(i.filename))
+
+    # Check the declared sizes first so a bomb is refused up front
+    declared = 0
+    for info in members:
+        if info.file_size > ZIP_MAX_MEMBER_BYTES:
+            raise ZipLimitError(f"{info.filename} is larger than {ZIP_MAX_MEMBER_BYTES} bytes")
+        if (info.file_size > ZIP_RATIO_MIN_BYTES
+                and info.file_size > ZIP_MAX_RATIO * max(info.compress_size, 1)):
+            raise ZipLimitError(f"{info.filename} has a suspicious compression ratio")
+        declared += info.file_size
+    if declared > ZIP_MAX_TOTAL_BYTES:
+        raise ZipLimitError(f"ZIP expands to more than {ZIP_MAX_TOTAL_BYTES} bytes")
+    return members
+
+
+def _read_member(z, info):
+    """Decompress one member; headers can lie, so cap what we actually read"""
+    with z.open(info) as fh:
+        data = fh.read(ZIP_MAX_MEMBER_BYTES + 1)
+    if len(data) > ZIP_MAX_MEMBER_BYTES:
+        raise ZipLimitError(f"{info.filename} is larger than {ZIP_MAX_MEMBER_BYTES} bytes")
+    return data
+
+
+def _member_path(info):
+    """Member path with forward slashes (the manifest key)"""
+    return "/".join(p for p in info.filename.replace("\\", "/").split("/") if p)
+
+
+def _zip_sources(zip_path):
+    """
+    Read every .py member of the ZIP into memory, one after another,
+    in the same order grade_folder would visit the extracted files
+    """
+    with stage("read"), zipfile.ZipFile(zip_path, "r") as z:
+        sources = []
+        total = 0
+        for info in _zip_members(z):
+            data = _read_member(z, info)
+            total += len(data)
+            if total > ZIP_MAX_TOTAL_BYTES:
+                raise ZipLimitError(f"ZIP expands to more than {ZIP_MAX_TOTAL_BYTES} bytes")
+            name = posixpath.basename(_member_path(info))
+            sources.append((name, _decode_source(data)))
+    return sources
+
+
+def grade_zip(zip_path, criteria, workers=1, chunksize=None, cache=None, progress=None):
+    """
+    Grade the .py files inside a submissions ZIP without extracting it
+    Gives the same output as extracting the ZIP and calling grade_folder
+    """
+    sources = _zip_sources(zip_path)
+    results = _score_sources(sources, criteria, workers, chunksize, cache, progress)
+    return _build_results(results, criteria)
+
+
+def grade_zip_incremental(zip_path, criteria, manifest, workers=1, chunksize=None, cache=None, progress=None):
+    """
+    Regrade a ZIP against the manifest from the previous upload
+    Only added or modified files are read and scored; unchanged files reuse
+    their stored result and deleted files drop out
+    Returns (df, feedback, changes) and updates manifest["files"] in place
+    """
+    previous = manifest["files"]
+    reusable = manifest.get("reusable", False)
+    files = {}
+    changes = {"added": [], "modified": [], "removed": [], "unchanged": 0, "first_upload": not previous}
+
+    results = []        # per member, in walk order; None = still to score
+    to_score = []       # (index, name, content)
+    with stage("read"), zipfile.ZipFile(zip_path, "r") as z:
+        members = _zip_members(z)
+        total = 0
+        for i, info in enumerate(members):
+            path = _member_path(info)
+            name = posixpath.basename(path)
+            old = previous.get(path)
+
+            # Same size + CRC: unchanged, and we don't even decompress it
+            if old and reusable and old["size"] == info.file_size and old["crc"] == info.CRC \
+                    and _reusable_result(old["result"]):
+                files[path] = old
+                results.append({**copy.deepcopy(old["result"]), "file": name})
+                changes["unchanged"] += 1
+                continue
+
+            data = _read_member(z, info)
+            total += len(data)
+            if total > ZIP_MAX_TOTAL_BYTES:
+                raise ZipLimitError(f"ZIP expands to more than {ZIP_MAX_TOTAL_BYTES} bytes")
+            sha = hashlib.sha256(data).hexdigest()
+            files[path] = {"size": info.file_size, "crc": info.CRC, "sha256": sha}
+
+            if old is None:
+                changes["added"].append(path)
+            elif old.get("sha256") != sha:
+                changes["modified"].append(path)
+            else:
+                changes["unchanged"] += 1
+                if reusable and _reusable_result(old["result"]):
+                    files[path]["result"] = old["result"]
+                    results.append({**copy.deepcopy(old["result"]), "file": name})
+                    continue
+            results.append(None)
+            to_score.append((i, name, _decode_source(data)))
+
+    changes["removed"] = sorted(set(previous) - set(files))
+
+    reused = len(results) - len(to_score)
+    scored = _score_sources([(name, content) for _, name, content in to_score], criteria,
+                            workers, chunksize, cache,
+                            progress and (lambda done, _: progress(reused + done, len(results))))
+    for (i, _, _), result in zip(to_score, scored):
+        results[i] = result
+
+    # Remember every result (without the display name) for the next upload
+    for info, result in zip(members, results):
+        files[_member_path(info)]["result"] = {k: v for k, v in result.items() if k != "file"}
+    manifest["files"] = files
+    manifest["reusable"] = True
+
+    df, feedback = _build_results(results, criteria)
+    return df, feedback, changes
+
+
+def _folder_sources(folder_path):
+    """(file name, content) for every .py file in the folder, in walk order"""
+    with stage("read"):
+        return [(os.path.basename(p), _read_source(p)) for p in _iter_python_files(folder_path)]
+
+
+def load_sources(source):
+    """
+    (file name, content) for every submission in a folder or ZIP, in the
+    same order the grade_* functions report them
+    """
+    if zipfile.is_zipfile(source):
+        return _zip_sources(source)
+    return _folder_sources(source)
+
+
+def grade_all_modules(source, workers=1, chunksize=None, progress=None, modules=None):
+    """
+    Score every file against every module's rubric in one pass
+    source is a folder or a submissions ZIP. Each file is analyzed once;
+    the raw criterion scores form a files x criteria matrix and the rubric
+    weights a criteria x modules matrix, so one matrix multiply gives
+    every module's total for every file
+    Returns a DataFrame: file, failed, then one total column per module
+    """
+    import numpy as np
+    import pandas as pd
+
+    modules = list(modules or CRITERIA_MAP)
+    sources = load_sources(source)
+    names = [name for name, _ in sources]
+
+    with stage("score"):
+        analyses = _pool_map(analyze_source, [content for _, content in sources], workers, chunksize,
+                             progress and (lambda n: progress(n, len(sources))))
+
+    # files x criteria raw scores (0-100) and criteria x modules weights
+    all_criteria = list(dict.fromkeys(c for m in modules for c in CRITERIA_MAP[m]))
+    evaluate = rubrics.evaluator(all_criteria)
+    zeros = [0] * len(all_criteria)
+    raw = np.array([zeros if isinstance(a, Limit) else list(evaluate(a).values()) for a in analyses],
+                   dtype=float).reshape(len(analyses), len(all_criteria))
+    weights = np.array([[CRITERIA_MAP[m].get(c, 0) for m in modules] for c in all_criteria], dtype=float)
+
+    totals = np.round(raw @ weights / 100, 2)
+
+    # Same rules as _score: while True / syntax errors / over budget get 1, and nobody gets 0
+    failed = np.array([isinstance(a, Limit) or a.has_while_true or not a.valid_syntax for a in analyses],
+                      dtype=bool)
+    totals[failed] = 1
+    totals[totals <= 0] = 1
+
+    columns = {"file": names, "failed": failed}
+    columns.update({m: totals[:, j] for j, m in enumerate(modules)})
+    return pd.DataFrame(columns)
+
+
+def apply_execution_scores(source, df, feedback, criteria, solution, fixtures, pool, progress=None):
+    """
+    Replace the static "output" score (is there a print?) with how closely
+    each program's output matches the solution's on the stdin fixtures
+    source is the folder or ZIP that df / feedback were graded from; both are
+    updated in place. Files that already auto-failed are not run
+    Returns a summary dict for the run; mode is "static" if the solution
+    itself doesn't run cleanly, in which case nothing is changed
+    """
+    weight = criteria.get("output")
+    if weight is None or feedback[0]["file"] == "No files found":
+        return {"mode": "static", "reason": "no output criterion or no files"}
+
+    with stage("execute.solution"):
+        expected = pool.run_many([(solution, stdin) for stdin in fixtures])
+    for r in expected:
+        if not r.ok:
+            reason = "timed out" if r.timed_out else f"stopped with {r.error}"
+            return {"mode": "static", "reason": f"solution {reason}"}
+
+    sources = load_sources(source)
+    to_run = [i for i, fb in enumerate(feedback) if not fb["failed"]]
+    jobs = [(sources[i][1], stdin) for i in to_run for stdin in fixtures]
+    with stage("execute.submissions"):
+        runs = pool.run_many(jobs, progress and (lambda n: progress(n, len(jobs))))
+
+    df["output"] = df["output"].astype(float)
+    df["total_grade"] = df["total_grade"].astype(float)
+    summary = {"mode": "execution", "fixtures": len(fixtures), "runs": len(jobs), "timeouts": 0, "errors": 0}
+    k = len(fixtures)
+    for n, i in enumerate(to_run):
+        mine = runs[n * k:(n + 1) * k]
+        similarity = sum(0.0 if r.timed_out else output_similarity(e.output, r.output)
+                         for e, r in zip(expected, mine)) / k
+        val = round(similarity * 100)
+
+        fb = feedback[i]
+        text = _criterion_feedback("output", val)
+        if val:
+            text += " (output compared with the solution)"
+        timeouts = sum(r.timed_out for r in mine)
+        errors = sorted({r.error for r in mine if r.error})
+        if timeouts:
+            text += f"\n⏱️ Timed out on {timeouts} of {k} test inputs"
+        if errors:
+            text += f"\n💥 Program stopped with {', '.join(errors)}"
+        summary["timeouts"] += timeouts
+        summary["errors"] += sum(1 for r in mine if r.error)
+
+        fb["output"] = round(val * weight / 100, 2)
+        fb["feedback"]["output"] = text
+        total = round(sum(fb[c] for c in criteria), 2)
+        fb["feedback"].pop("general", None)
+        if total <= 0:
+            total = 1
+            fb["feedback"]["general"] = "⚠️ No criteria met - Please review requirements and resubmit."
+        fb["total_grade"] = total
+        df.at[i, "output"] = fb["output"]
+        df.at[i, "total_grade"] = total
+    return summary
+
+
+if __name__ == "__main__":
+    # python -m grader ... runs the command-line batch grader (see grader_cli.py)
+    import sys
+    from grader_cli import main
+    sys.exit(main())
@@ -0,0 +1,222 @@
+"""
+Command-line batch grader for M7Pro Grader
+Grades any number of submission ZIPs / folders without the web UI:
+    python -m grader --module M3 fall2025/*.zip spring2026/ --csv grades.csv
+One JSON line is printed per file as soon as it is graded (in the order the
+workers finish), then one summary line, so the output can be piped into jq
+or a script. Sources are read one at a time and only a few files per worker
+are in flight, so memory stays flat however big the archive is
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+import zipfile
+from collections import deque
+
+import columnar
+from budget import DEFAULT_BUDGET, LIMIT_KINDS, Limit, WatchdogPool, call_guarded
+from grader import (CRITERIA_MAP, ZipLimitError, _WithRubrics, _decode_source, _iter_python_files,
+                    _limit_result, _member_path, _read_member, _read_source, _reusable_result, _score,
+                    _zip_members, scoring_version)
+from score_cache import ScoreCache, make_key
+
+# Files queued per worker; enough to keep them busy, few enough to bound memory
+IN_FLIGHT_PER_WORKER = 4
+
+# Cached results are written in batches of this many
+CACHE_BATCH = 200
+
+
+def iter_submissions(sources):
+    """
+    Yield (source, path inside it, content) for every .py file, one source
+    after another in walk order; a source that can't be read yields
+    (source, None, error message) instead
+    """
+    for source in sources:
+        try:
+            if os.path.isdir(source):
+                for path in _iter_python_files(source):
+                    yield source, os.path.relpath(path, source).replace(os.sep, "/"), _read_source(path)
+            else:
+                with zipfile.ZipFile(source, "r") as z:
+                    for info in _zip_members(z):
+                        yield source, _member_path(info), _decode_source(_read_member(z, info))
+        except (OSError, zipfile.BadZipFile, ZipLimitError) as e:
+            yield source, None, f"{type(e).__name__}: {e}"
+
+
+def _record(source, path, module, result):
+    """One JSON line: where the file came from, its scores and feedback (no snippet)"""
+    return {"source": source, "file": path, "module": module,
+            **{k: v for k, v in result.items() if k not in ("file", "snippet")}}
+
+
+def grade_sources(sources, module, workers=None, cache=None, budget=None):
+    """
+    Grade every .py file in the sources (ZIPs or folders) against one module
+    Yields a record per file as it finishes, and {"source", "error"} for a
+    source that can't be read; the last item is {"summary": {...}}
+    workers=None means one per CPU. Files are scored in watched worker
+    processes under the per-file budgets (see budget.py); with workers=1
+    and the time / memory budgets off they are scored in this process
+    """
+    criteria = CRITERIA_MAP[module]
+    score = _WithRubrics(_score, criteria)
+    version = scoring_version(criteria)
+    budget = budget or DEFAULT_BUDGET
+    workers = workers or os.cpu_count() or 1
+    start = time.perf_counter()
+    summary = {"module": module, "sources": len(sources), "files": 0, "cached": 0,
+               "auto_failed": 0, "grade1": 0, "average_grade": None, "errors": [],
+               "resource_limits": dict.fromkeys(LIMIT_KINDS, 0)}
+    total_grade = 0.0
+    pending_cache = {}
+    ready = deque()     # records that need no scoring (cached, unreadable), waiting to be yielded
+
+    def finish(source, path, key, content, result):
+        nonlocal total_grade
+        if isinstance(result, Limit):
+            result = _limit_result(result, criteria, content)
+            summary["resource_limits"][result["limit"]] += 1
+        if cache is not None and key is not None and _reusable_result(result):
+            pending_cache[key] = result
+            if len(pending_cache) >= CACHE_BATCH:
+                cache.put_many(pending_cache)
+                pending_cache.clear()
+        summary["files"] += 1
+        summary["auto_failed"] += bool(result.get("failed"))
+        summary["grade1"] += result["total_grade"] == 1
+        total_grade += result["total_grade"]
+        return _record(source, path, module, result)
+
+    def to_score():
+        """(source, path, cache key), content for every file that needs scoring"""
+        for source, path, content in iter_submissions(sources):
+            if path is None:
+                summary["errors"].append({"source": source, "error": content})
+                ready.append({"source": source, "error": content})
+                continue
+            key = make_key(content, criteria, version) if cache is not None else None
+            result = cache.get_many([key]).get(key) if key is not None else None
+            if result is not None:
+                summary["cached"] += 1
+                ready.append(finish(source, path, None, content, result))
+            elif budget.max_bytes and len(content) > budget.max_bytes:
+                ready.append(finish(source, path, key, content, Limit("size", f"{len(content)} bytes")))
+            else:
+                yield (source, path, key), content
+
+    try:
+        if workers > 1 or budget.watched:
+            # Only IN_FLIGHT_PER_WORKER files per worker are read ahead
+            in_flight = {}
+
+            def numbered():
+                for n, (where, content) in enumerate(to_score()):
+                    in_flight[n] = (*where, content)
+                    yield n, content
+
+            with WatchdogPool(score, workers, budget, IN_FLIGHT_PER_WORKER) as pool:
+                for n, result in pool.imap_unordered(numbered()):
+                    while ready:
+                        yield ready.popleft()
+                    yield finish(*in_flight.pop(n), result)
+        else:
+            for where, content in to_score():
+                while ready:
+                    yield ready.popleft()
+                yield finish(*where, content, call_guarded(score, content))
+        while ready:
+            yield ready.popleft()
+    finally:
+        if cache is not None and pending_cache:
+            cache.put_many(pending_cache)
+
+    if summary["files"]:
+        summary["average_grade"] = round(total_grade / summary["files"], 2)
+    summary["seconds"] = round(time.perf_counter() - start, 3)
+    yield {"summary": summary}
+
+
+def write_tables(records, module, xlsx=None, parquet=None):
+    """Write the collected records as an XLSX workbook and/or a Parquet file"""
+    import pandas as pd   # heavy - only needed for these formats
+
+    criteria = list(CRITERIA_MAP[module])
+    df = pd.DataFrame([{k: r[k] for k in ("source", "file", *criteria, "total_grade")} for r in records],
+                      columns=["source", "file", *criteria, "total_grade"])
+    if parquet:
+        # Same typed layout as the runs' Parquet files, plus the source column
+        columnar.write_run(parquet, df, records, {"module": module, "weights": CRITERIA_MAP[module]})
+    if xlsx:
+        from excel_export import write_excel
+        # The workbook has one "file" column, so the source goes in front of it
+        names = [f"{os.path.basename(os.path.normpath(r['source']))}/{r['file']}" for r in records]
+        feedback = [{**r, "file": name} for r, name in zip(records, names)]
+        write_excel(xlsx, df.drop(columns="source").assign(file=names), module, feedback)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m grader",
+                                     description="Grade submission ZIPs / folders without the web UI")
+    parser.add_argument("sources", nargs="+", help="submission ZIPs or folders of .py files")
+    parser.add_argument("--module", required=True, choices=list(CRITERIA_MAP), help="rubric to grade against")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: one per CPU)")
+    parser.add_argument("--cache", default=None, help="score cache file, reused across runs (SQLite)")
+    parser.add_argument("--jsonl", default=None, help="write the JSON lines here instead of stdout")
+    parser.add_argument("--csv", default=None, help="also write the grades as CSV")
+    parser.add_argument("--xlsx", default=None, help="also write the results workbook")
+    parser.add_argument("--parquet", default=None, help="also write the grades as Parquet (needs pyarrow)")
+    args = parser.parse_args(argv)
+
+    if args.parquet and not columnar.available():
+        parser.error("--parquet needs pyarrow (pip install pyarrow)")
+    missing = [s for s in args.sources if not os.path.exists(s)]
+    if missing:
+        parser.error(f"not found: {', '.join(missing)}")
+
+    criteria = list(CRITERIA_MAP[args.module])
+    cache = ScoreCache(args.cache) if args.cache else None
+    out = open(args.jsonl, "w", encoding="utf-8") if args.jsonl else sys.stdout
+    csv_file = open(args.csv, "w", newline="", encoding="utf-8") if args.csv else None
+    csv_writer = None
+    if csv_file:
+        csv_writer = csv.DictWriter(csv_file, ["source", "file", *criteria, "total_grade"], extrasaction="ignore")
+        csv_writer.writeheader()
+    records = [] if args.xlsx or args.parquet else None
+
+    summary = {}
+    try:
+        for item in grade_sources(args.sources, args.module, args.workers, cache):
+            out.write(json.dumps(item, ensure_ascii=False) + "\n")
+            out.flush()
+            if "summary" in item:
+                summary = item["summary"]
+            elif "error" not in item:
+                if csv_writer:
+                    csv_writer.writerow(item)
+                if records is not None:
+                    records.append(item)
+        if records is not None:
+            write_tables(records, args.module, args.xlsx, args.parquet)
+    finally:
+        if csv_file:
+            csv_file.close()
+        if out is not sys.stdout:
+            out.close()
+
+    print(f"Graded {summary.get('files', 0)} files from {summary.get('sources', 0)} sources "
+          f"in {summary.get('seconds', 0)}s ({len(summary.get('errors', []))} unreadable)", file=sys.stderr)
+    limits = {k: v for k, v in summary.get("resource_limits", {}).items() if v}
+    if limits:
+        print("Over resource budget (graded 1): " + ", ".join(f"{v} {k}" for k, v in limits.items()),
+              file=sys.stderr)
+    return 1 if summary.get("errors") else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
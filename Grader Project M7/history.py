@@ -0,0 +1,331 @@
+"""
+Grade history for M7Pro Grader
+Every graded submission is kept in SQLite, so progress can be followed
+across runs and modules long after the run's own files are gone:
+- grades      one row per submission: run, course, module, student, file, total
+- scores      its points per criterion, as in the results CSV
+- run_scores  per run, the average share (0-100%) of each criterion's
+              points
+- runs        per run totals (submissions, passing, grade 1, ...)
+- latest      each student's latest submission per course + module
+The per-run and latest tables are filled when a run is added, so trends
+and cohort comparisons read a few rows per run or student instead of
+every submission; the rest only touch indexes, so queries stay in the
+milliseconds with hundreds of thousands of submissions
+Students are matched across runs and modules by student_id(file name)
+"""
+import re
+import sqlite3
+import threading
+import time
+
+# Grades at or above this count as passing (same as the results page)
+PASSING_GRADE = 70
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS runs ("
+    " run_id TEXT PRIMARY KEY,"
+    " course TEXT NOT NULL,"
+    " module TEXT NOT NULL,"
+    " created REAL NOT NULL,"
+    " files INTEGER NOT NULL,"
+    " total REAL NOT NULL,"
+    " passing INTEGER NOT NULL,"
+    " grade_1 INTEGER NOT NULL,"
+    " failed INTEGER NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS grades ("
+    " id INTEGER PRIMARY KEY,"
+    " run_id TEXT NOT NULL REFERENCES runs (run_id),"
+    " course TEXT NOT NULL,"
+    " module TEXT NOT NULL,"
+    " student TEXT NOT NULL,"
+    " file TEXT NOT NULL,"
+    " created REAL NOT NULL,"
+    " total_grade REAL NOT NULL,"
+    " failed INTEGER NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS scores ("
+    " grade_id INTEGER NOT NULL REFERENCES grades (id),"
+    " criterion TEXT NOT NULL,"
+    " score REAL NOT NULL,"
+    " PRIMARY KEY (grade_id, criterion)) WITHOUT ROWID",
+    "CREATE TABLE IF NOT EXISTS run_scores ("
+    " run_id TEXT NOT NULL REFERENCES runs (run_id),"
+    " course TEXT NOT NULL,"
+    " module TEXT NOT NULL,"
+    " created REAL NOT NULL,"
+    " criterion TEXT NOT NULL,"
+    " average REAL NOT NULL,"
+    " PRIMARY KEY (run_id, criterion)) WITHOUT ROWID",
+    # Replaced by latest, which also knows the student's current grade
+    "DROP TABLE IF EXISTS students",
+    "CREATE TABLE IF NOT EXISTS latest ("
+    " module TEXT NOT NULL,"
+    " course TEXT NOT NULL,"
+    " student TEXT NOT NULL,"
+    " grade_id INTEGER NOT NULL REFERENCES grades (id),"
+    " created REAL NOT NULL,"
+    " total_grade REAL NOT NULL,"
+    " failed INTEGER NOT NULL,"
+    " PRIMARY KEY (module, course, student)) WITHOUT ROWID",
+    "CREATE INDEX IF NOT EXISTS runs_module ON runs (module, course, created)",
+    "CREATE INDEX IF NOT EXISTS runs_created ON runs (created)",
+    "CREATE INDEX IF NOT EXISTS grades_student ON grades (student, course, module, created)",
+    "CREATE INDEX IF NOT EXISTS grades_file ON grades (file)",
+    "CREATE INDEX IF NOT EXISTS grades_run ON grades (run_id)",
+    "CREATE INDEX IF NOT EXISTS grades_created ON grades (module, created)",
+    "CREATE INDEX IF NOT EXISTS run_scores_trend ON run_scores (module, course, criterion, created, average)",
+)
+
+# Canvas submission downloads: name_[LATE_]userid_submissionid_original.py
+_CANVAS = re.compile(r"^([a-z]+)_(?:late_)?\d+_\d+_", re.IGNORECASE)
+# Module tags students put in file names: M3, m3_, mod3, module 3, lab3 ...
+_MODULE_TAG = re.compile(r"(?<![a-z])(?:m|mod|module|lab|assignment|hw)[\s_-]*\d+(?![0-9])", re.IGNORECASE)
+_SEPARATORS = re.compile(r"[^a-z0-9]+")
+
+
+def student_id(file):
+    """
+    Key that matches one student's files across runs and modules:
+    "smithjohn_12345_67890_M3_lab.py" and "SmithJohn_M4.py" -> "smithjohn"
+    - Canvas downloads (name_[late_]userid_submissionid_anything.py): the
+      name before the ids
+    - anything else: the file name without folders, extension, module tags
+      (M3, mod3, module 3, lab3, hw3, assignment3) and punctuation, lowercased
+    Everything else in the name stays part of the key, so "smith_M3.py"
+    and "smith_M4_final.py" are two students ("smith", "smithfinal"), and
+    so are files named by number and content like the benchmark corpus's
+    student_00001_normal.py. Name files <student>_<module>.py (or keep
+    Canvas names) for progress to line up across modules
+    """
+    name = file.replace("\\", "/").rsplit("/", 1)[-1]
+    canvas = _CANVAS.match(name)
+    if canvas:
+        return canvas.group(1).lower()
+    stem = name.rsplit(".", 1)[0] if "." in name else name
+    key = _SEPARATORS.sub("", _MODULE_TAG.sub(" ", stem).lower())
+    return key or stem.lower()
+
+
+class GradeHistory:
+    """SQLite store of every graded submission across runs"""
+
+    def __init__(self, path):
+        self.path = str(path)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        for statement in _SCHEMA:
+            self._db.execute(statement)
+        self._db.commit()
+        self._backfill_latest()
+
+    def add_run(self, run_id, course, module, criteria, rows, created=None):
+        """
+        Store a graded run; criteria is the module's {criterion: weight}
+        and rows are dicts with file, the criteria, total_grade and failed
+        (the run's DataFrame records + feedback)
+        Adding a run id again replaces it
+        """
+        created = time.time() if created is None else created
+        rows = [r for r in rows if r.get("file") != "No files found"]
+        totals = [float(r["total_grade"]) for r in rows]
+        with self._lock, self._db:
+            touched = self._delete(run_id)
+            failed = [int(bool(r.get("failed"))) for r in rows]
+            self._db.execute(
+                "INSERT INTO runs (run_id, course, module, created, files, total, passing, grade_1, failed)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (run_id, course, module, created, len(rows), sum(totals),
+                 sum(t >= PASSING_GRADE for t in totals), sum(t == 1 for t in totals), sum(failed)))
+            scores = []
+            latest = {}
+            for row, total, fail in zip(rows, totals, failed):
+                student = student_id(row["file"])
+                cur = self._db.execute(
+                    "INSERT INTO grades (run_id, course, module, student, file, created, total_grade, failed)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (run_id, course, module, student, row["file"], created, total, fail))
+                latest[student] = (module, course, student, cur.lastrowid, created, total, fail)
+                scores.extend((cur.lastrowid, c, float(row[c])) for c in criteria if row.get(c) is not None)
+            self._db.executemany("INSERT INTO scores (grade_id, criterion, score) VALUES (?, ?, ?)", scores)
+            # A re-upload replaces the student's entry; an older run added later doesn't
+            self._db.executemany(
+                "INSERT INTO latest (module, course, student, grade_id, created, total_grade, failed)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT (module, course, student) DO UPDATE SET"
+                " grade_id = excluded.grade_id, created = excluded.created,"
+                " total_grade = excluded.total_grade, failed = excluded.failed"
+                " WHERE excluded.created >= latest.created", latest.values())
+            # Students of a replaced run: recomputed from what is left
+            self._refresh_latest(touched)
+            if rows:
+                self._db.executemany(
+                    "INSERT INTO run_scores (run_id, course, module, created, criterion, average)"
+                    " VALUES (?, ?, ?, ?, ?, ?)",
+                    [(run_id, course, module, created, c,
+                      sum(float(r.get(c) or 0) for r in rows) / len(rows) / weight * 100 if weight else 0.0)
+                     for c, weight in criteria.items()])
+
+    def _delete(self, run_id):
+        """Remove a run; returns the (module, course, student) entries of latest it affected"""
+        students = self._db.execute("SELECT DISTINCT module, course, student FROM grades WHERE run_id = ?",
+                                    (run_id,)).fetchall()
+        self._db.execute("DELETE FROM scores WHERE grade_id IN (SELECT id FROM grades WHERE run_id = ?)",
+                         (run_id,))
+        self._db.execute("DELETE FROM grades WHERE run_id = ?", (run_id,))
+        self._db.execute("DELETE FROM run_scores WHERE run_id = ?", (run_id,))
+        self._db.execute("DELETE FROM runs WHERE run_id = ?", (run_id,))
+        return set(students)
+
+    def _refresh_latest(self, students):
+        """Point latest at each student's newest remaining submission (or drop the student)"""
+        for module, course, student in students:
+            self._db.execute("DELETE FROM latest WHERE module = ? AND course = ? AND student = ?",
+                             (module, course, student))
+            self._db.execute(
+                "INSERT INTO latest (module, course, student, grade_id, created, total_grade, failed)"
+                " SELECT module, course, student, id, created, total_grade, failed FROM grades"
+                " WHERE student = ? AND course = ? AND module = ? ORDER BY created DESC, id DESC LIMIT 1",
+                (student, course, module))
+
+    def _backfill_latest(self):
+        """Fill latest for a history written before it existed"""
+        with self._db:
+            if self._db.execute("SELECT 1 FROM latest LIMIT 1").fetchone() is None:
+                self._refresh_latest(self._db.execute(
+                    "SELECT DISTINCT module, course, student FROM grades").fetchall())
+
+    def has_run(self, run_id):
+        with self._lock:
+            return self._db.execute("SELECT 1 FROM runs WHERE run_id = ?", (run_id,)).fetchone() is not None
+
+    def _rows(self, sql, params):
+        with self._lock:
+            cur = self._db.execute(sql, params)
+            names = [d[0] for d in cur.description]
+            return [dict(zip(names, row)) for row in cur.fetchall()]
+
+    def students(self, search="", course=None, limit=50):
+        """Students whose id starts with search, with how many submissions each has"""
+        # Range scan on the student index instead of LIKE, which can't use it
+        search = student_id(search) if search else ""
+        sql = ("SELECT student, COUNT(*) AS submissions, COUNT(DISTINCT module) AS modules,"
+               " MAX(created) AS last_graded FROM grades WHERE student >= ? AND student < ?")
+        params = [search, search + "\uffff"]
+        if course:
+            sql += " AND course = ?"
+            params.append(course)
+        sql += " GROUP BY student ORDER BY student LIMIT ?"
+        return self._rows(sql, [*params, limit])
+
+    def student_progress(self, student, course=None):
+        """
+        Every graded submission of one student, oldest first, with its
+        per-criterion scores, and the latest grade per module
+        """
+        sql = ("SELECT id, run_id, course, module, file, created, total_grade, failed"
+               " FROM grades WHERE student = ?")
+        params = [student]
+        if course:
+            sql += " AND course = ?"
+            params.append(course)
+        grades = self._rows(sql + " ORDER BY created, id", params)
+        if grades:
+            ids = [g["id"] for g in grades]
+            scores = {}
+            with self._lock:
+                for i in range(0, len(ids), 500):
+                    batch = ids[i:i + 500]
+                    for grade_id, criterion, score in self._db.execute(
+                            f"SELECT grade_id, criterion, score FROM scores"
+                            f" WHERE grade_id IN ({','.join('?' * len(batch))})", batch):
+                        scores.setdefault(grade_id, {})[criterion] = score
+            for g in grades:
+                g["failed"] = bool(g["failed"])
+                g["scores"] = scores.get(g.pop("id"), {})
+        latest = {}
+        for g in grades:
+            latest[g["module"]] = g["total_grade"]
+        return {"student": student, "course": course, "submissions": grades, "latest": latest}
+
+    def criterion_trends(self, module, course=None, since=None, until=None):
+        """
+        Average share of each criterion's points per run, over time:
+        {criterion: [{run_id, course, created, average}]}, average in 0-100
+        """
+        sql = "SELECT criterion, run_id, course, created, average FROM run_scores WHERE module = ?"
+        params = [module]
+        if course:
+            sql += " AND course = ?"
+            params.append(course)
+        if since is not None:
+            sql += " AND created >= ?"
+            params.append(since)
+        if until is not None:
+            sql += " AND created < ?"
+            params.append(until)
+        trends = {}
+        for row in self._rows(sql + " ORDER BY criterion, created", params):
+            trends.setdefault(row.pop("criterion"), []).append(row)
+        return trends
+
+    def cohorts(self, module, courses=None):
+        """
+        Per course for a module: runs and graded files (every upload), and
+        students, average, passing rate and grade-1 count over each
+        student's latest submission, so re-uploads aren't counted twice
+        """
+        sql = ("SELECT course, COUNT(*) AS students,"
+               " ROUND(AVG(total_grade), 2) AS average_grade,"
+               " ROUND(100.0 * SUM(total_grade >= ?) / COUNT(*), 1) AS passing_rate,"
+               " SUM(total_grade = 1) AS grade_1_count, SUM(failed) AS failed,"
+               " (SELECT COUNT(*) FROM runs r WHERE r.module = l.module AND r.course = l.course) AS runs,"
+               " (SELECT SUM(files) FROM runs r WHERE r.module = l.module AND r.course = l.course) AS submissions"
+               " FROM latest l WHERE module = ?")
+        params = [PASSING_GRADE, module]
+        if courses:
+            sql += f" AND course IN ({','.join('?' * len(courses))})"
+            params.extend(courses)
+        return self._rows(sql + " GROUP BY course ORDER BY course", params)
+
+    def courses(self):
+        """Every course with graded runs, and its modules"""
+        found = {}
+        for row in self._rows("SELECT DISTINCT course, module FROM runs ORDER BY course, module", []):
+            found.setdefault(row["course"], []).append(row["module"])
+        return found
+
+    def count(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM grades").fetchone()[0]
+
+
+def import_runs(history, runs_root):
+    """Add every stored grading run that isn't in the history yet; returns how many"""
+    from pathlib import Path
+    from rubrics import CRITERIA_MAP
+    from runs import load_run
+
+    count = 0
+    for meta_path in sorted(Path(runs_root).glob("*/meta.json")):
+        run_id = meta_path.parent.name
+        if history.has_run(run_id):
+            continue
+        context = load_run(runs_root, run_id)
+        if context is None or context.get("kind") == "compare":
+            continue
+        criteria = context.get("weights") or CRITERIA_MAP.get(context["module"])
+        if not criteria:
+            continue
+        rows = [{**fb, **row} for row, fb in zip(context["df"].to_dict(orient="records"), context["feedback"])]
+        history.add_run(run_id, context.get("course", "default"), context["module"], criteria, rows,
+                        context.get("created"))
+        count += 1
+    return count
+
+
+if __name__ == "__main__":
+    import os
+    import sys
+    uploads = sys.argv[1] if len(sys.argv) > 1 else "uploads"
+    added = import_runs(GradeHistory(os.path.join(uploads, "history.sqlite3")), os.path.join(uploads, "runs"))
+    print(f"Added {added} runs to the grade history")
@@ -0,0 +1,153 @@
+"""
+Background grading jobs for M7Pro Grader
+Uploads queue a job on a local executor and get a job id back right away;
+the /jobs/<id> endpoint reports progress while the job runs
+A job can mirror its status to a JSON file in its run workspace, so any
+worker process can report on it, not only the one running it
+"""
+import json
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+# Finished jobs kept in memory for the results page
+MAX_FINISHED_JOBS = 50
+
+# Seconds between status file writes while a job is running
+STATUS_INTERVAL = 0.5
+
+# A status file still saying "running" this long after its last write
+# belongs to a process that died mid-job
+STALE_SECONDS = 6 * 3600
+
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="grader-job")
+_jobs = {}
+_lock = threading.Lock()
+
+
+class Job:
+    """One grading run and its progress counters"""
+
+    def __init__(self, module, job_id=None, status_path=None):
+        self.id = job_id or uuid.uuid4().hex
+        self.module = module
+        self.done = 0
+        self.total = 0
+        self.created = time.time()
+        self.finished = None
+        self.error = None
+        self.result = None
+        self.status_path = status_path
+        self._last_write = 0.0
+
+    @property
+    def status(self):
+        if self.error is not None:
+            return "failed"
+        if self.finished is not None:
+            return "finished"
+        return "running"
+
+    def progress(self, done, total):
+        """Progress callback handed to the grader"""
+        self.done = done
+        self.total = total
+        if time.time() - self._last_write >= STATUS_INTERVAL:
+            self.write_status()
+
+    def write_status(self):
+        """Mirror the job status to its status file (if it has one)"""
+        if not self.status_path:
+            return
+        self._last_write = time.time()
+        tmp = f"{self.status_path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({**self.to_dict(), "result": self.result}, f)
+        os.replace(tmp, self.status_path)
+
+    def to_dict(self):
+        end = self.finished or time.time()
+        return {
+            "id": self.id,
+            "module": self.module,
+            "status": self.status,
+            "done": self.done,
+            "total": self.total,
+            "elapsed": round(end - self.created, 2),
+            "error": self.error,
+        }
+
+
+def _run(job, func, args):
+    try:
+        job.result = func(job, *args)
+    except Exception as e:
+        job.error = str(e) or e.__class__.__name__
+    finally:
+        job.finished = time.time()
+        try:
+            job.write_status()
+        except OSError:
+            pass
+
+
+def submit_job(module, func, *args, job_id=None, status_path=None):
+    """
+    Queue func(job, *args) on the executor and return the Job
+    Whatever func returns is stored on job.result
+    """
+    job = Job(module, job_id, status_path)
+    job.write_status()
+    with _lock:
+        _jobs[job.id] = job
+        _prune()
+    _executor.submit(_run, job, func, args)
+    return job
+
+
+def get_job(job_id):
+    """Return the Job with this id, or None"""
+    with _lock:
+        return _jobs.get(job_id)
+
+
+def read_status(status_path):
+    """
+    Status dict written by a job, possibly in another worker process
+    Returns None if there is no status file
+    """
+    try:
+        with open(status_path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def status_running(status_path, stale=STALE_SECONDS):
+    """
+    True if the status file says its job is queued or running - in this
+    or any other worker process - and was written within stale seconds
+    """
+    status = read_status(status_path)
+    if not status or status.get("status") != "running":
+        return False
+    try:
+        return time.time() - os.path.getmtime(status_path) <= stale
+    except OSError:
+        return False
+
+
+def running_job_ids():
+    """Ids of jobs this process is still running"""
+    with _lock:
+        return {j.id for j in _jobs.values() if j.finished is None}
+
+
+def _prune():
+    """Forget the oldest finished jobs once there are too many"""
+    finished = [j for j in _jobs.values() if j.finished is not None]
+    finished.sort(key=lambda j: j.finished)
+    for job in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+        del _jobs[job.id]
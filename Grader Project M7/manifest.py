@@ -0,0 +1,61 @@
+"""
+Submission manifests for incremental regrading
+One manifest per course + module records every submission's relative path,
+size, CRC and SHA-256 together with the result it got last time, so a
+re-uploaded ZIP only rescores files that were added or changed
+"""
+import json
+import os
+import re
+import threading
+from pathlib import Path
+
+_locks = {}
+_locks_guard = threading.Lock()
+
+
+def manifest_path(root, course, module):
+    """File that holds the manifest for one course + module"""
+    safe_course = re.sub(r"[^A-Za-z0-9_-]+", "_", course or "default").strip("_") or "default"
+    return Path(root) / f"{safe_course}__{module}.json"
+
+
+def manifest_lock(path):
+    """Lock that serializes regrades sharing the same manifest"""
+    with _locks_guard:
+        return _locks.setdefault(str(path), threading.Lock())
+
+
+def new_manifest(criteria, version):
+    return {"version": version, "criteria": [list(kv) for kv in criteria.items()], "files": {}}
+
+
+def load_manifest(path, criteria, version):
+    """
+    Load the manifest, or start an empty one if there isn't one yet
+    manifest["reusable"] says whether stored results still apply
+    (same grader version and the same criteria weights). If they don't,
+    every file is rescored, so the manifest takes the current version and
+    weights - saved with the new results, it is reusable next time
+    """
+    weights = [list(kv) for kv in criteria.items()]
+    try:
+        with open(path, encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        manifest = new_manifest(criteria, version)
+    manifest["reusable"] = manifest.get("version") == version and manifest.get("criteria") == weights
+    manifest["version"] = version
+    manifest["criteria"] = weights
+    return manifest
+
+
+def save_manifest(path, manifest):
+    """Write the manifest atomically"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    data = {k: v for k, v in manifest.items() if k != "reusable"}
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp, path)
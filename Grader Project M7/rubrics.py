@@ -0,0 +1,309 @@
+"""
+Rubrics for M7Pro Grader
+Each module's rubric is a JSON file in rubrics/ named after the module:
+    M1.json  {"name": "M1 - Input Output", "weights": {"input": 30, "output": 50, ...}}
+rubrics/criteria.json says how every criterion is detected and explained:
+    "pseudocode": {"count": ["comment_count"], "points": 10, "missing": "💬 Add comments..."}
+- count: SourceAnalysis fields (see functions.py) that are added up
+- points: score per counted item; the raw score is capped at 100
+- missing: feedback when the raw score is 0
+- levels (optional): feedback bands, instead of the shared feedback_levels
+A module file may define extra criteria under "criteria" the same way
+The criteria a module uses are compiled into one evaluator function that
+computes only those. refresh() reloads the files when they change, so a
+new module (M6.json) or a new weight needs no code change and no restart
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from pathlib import Path
+
+from functions import SourceAnalysis
+
+# Shipped rubrics; more folders can be added with add_dir (later ones win)
+BUILTIN_DIR = Path(__file__).resolve().parent / "rubrics"
+CRITERIA_FILE = "criteria.json"
+
+# Seconds between checks for edited rubric files
+CHECK_INTERVAL = 1.0
+
+# SourceAnalysis fields a rule may count (the two flags are auto-fail rules)
+FIELDS = frozenset(SourceAnalysis._fields) - {"valid_syntax", "has_while_true"}
+
+_MODULE_ID = re.compile(r"^[A-Za-z0-9_-]+$")
+
+
+class RubricError(ValueError):
+    """Raised when a rubric file is malformed or refers to an unknown criterion"""
+
+
+# Live views of the loaded rubrics. They are updated in place on reload,
+# so modules that imported them (grader.CRITERIA_MAP, ...) stay current
+CRITERIA_MAP = {}       # module -> {criterion: weight}
+LOCAL_EXPLAIN = {}      # criterion -> feedback when it is missing
+MODULE_NAMES = {}       # module -> display name
+
+# Why the last reload was refused (the previous rubrics stay active), or None
+last_error = None
+
+_dirs = [BUILTIN_DIR]
+_lock = threading.RLock()
+_rules = {}             # criterion -> validated rule
+_levels = []            # shared feedback bands
+_evaluators = {}        # tuple of criteria -> compiled evaluator
+_stamp = None           # (path, mtime, size) of every rubric file last loaded
+_last_check = 0.0
+_env_dir = os.environ.get("M7PRO_RUBRIC_DIR")
+if _env_dir:
+    _dirs.append(Path(_env_dir))
+
+
+def _natural_key(name):
+    """M2 before M10"""
+    return [int(p) if p.isdigit() else p for p in re.split(r"(\d+)", name)]
+
+
+def _read(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError) as e:
+        raise RubricError(f"{path.name}: {e}") from e
+    if not isinstance(data, dict):
+        raise RubricError(f"{path.name}: expected a JSON object")
+    return data
+
+
+def _number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _parse_levels(levels, where):
+    """[{"below": 50, "text": "..."}, ..., {"below": null, "text": "..."}] -> [(below, text)]"""
+    if not isinstance(levels, list) or not levels:
+        raise RubricError(f"{where}: feedback levels must be a non-empty list")
+    parsed = []
+    for level in levels:
+        below = level.get("below") if isinstance(level, dict) else None
+        if not isinstance(level, dict) or not isinstance(level.get("text"), str) \
+                or not (below is None or _number(below)):
+            raise RubricError(f"{where}: each level needs a text and a numeric (or null) below")
+        parsed.append((below, level["text"]))
+    return parsed
+
+
+def _parse_rule(name, spec, where):
+    if not isinstance(spec, dict):
+        raise RubricError(f"{where}: criterion {name!r} must be an object")
+    count = spec.get("count")
+    if isinstance(count, str):
+        count = [count]
+    if not isinstance(count, list) or not count or not all(f in FIELDS for f in count):
+        raise RubricError(f"{where}: {name!r} must count fields from: {', '.join(sorted(FIELDS))}")
+    points = spec.get("points", 100)
+    if not _number(points) or points <= 0:
+        raise RubricError(f"{where}: {name!r} points must be a positive number")
+    return {
+        "count": list(count),
+        "points": points,
+        "missing": str(spec.get("missing", "❌ Missing requirement")),
+        "levels": _parse_levels(spec["levels"], f"{where} ({name})") if "levels" in spec else None,
+    }
+
+
+def _rubric_files():
+    """(criteria files, {module: file}) across every rubric folder"""
+    criteria_files, modules = [], {}
+    for folder in _dirs:
+        if not folder.is_dir():
+            continue
+        for path in sorted(folder.glob("*.json")):
+            if path.name == CRITERIA_FILE:
+                criteria_files.append(path)
+            else:
+                modules[path.stem] = path
+    return criteria_files, modules
+
+
+def _file_stamp():
+    criteria_files, modules = _rubric_files()
+    stamp = []
+    for path in [*criteria_files, *modules.values()]:
+        try:
+            st = path.stat()
+        except OSError:
+            continue
+        stamp.append((str(path), st.st_mtime_ns, st.st_size))
+    return tuple(stamp)
+
+
+def _load():
+    """Read and check every rubric file; returns (rules, levels, {module: (name, weights)})"""
+    criteria_files, module_files = _rubric_files()
+    levels = None
+    rules = {}
+    for path in criteria_files:
+        data = _read(path)
+        if "feedback_levels" in data:
+            levels = _parse_levels(data["feedback_levels"], path.name)
+        for name, spec in data.get("criteria", {}).items():
+            rules[name] = _parse_rule(name, spec, path.name)
+    if levels is None:
+        raise RubricError(f"no feedback_levels in any {CRITERIA_FILE}")
+
+    modules = {}
+    for module in sorted(module_files, key=_natural_key):
+        path = module_files[module]
+        if not _MODULE_ID.match(module) or module == "ALL":
+            raise RubricError(f"{path.name}: not a usable module id")
+        data = _read(path)
+        for name, spec in data.get("criteria", {}).items():
+            rules[name] = _parse_rule(name, spec, path.name)
+        weights = data.get("weights")
+        if not isinstance(weights, dict) or not weights:
+            raise RubricError(f"{path.name}: weights must map criteria to numbers")
+        for name, weight in weights.items():
+            if not _number(weight) or weight < 0:
+                raise RubricError(f"{path.name}: weight of {name!r} must be a number >= 0")
+        modules[module] = (str(data.get("name", module)), dict(weights))
+
+    for module, (_, weights) in modules.items():
+        unknown = [name for name in weights if name not in rules]
+        if unknown:
+            raise RubricError(f"{module}.json: unknown criteria {unknown}")
+    if not modules:
+        raise RubricError("no module rubrics found")
+    return rules, levels, modules
+
+
+def _replace(live, new):
+    """Update a live dict in place without ever leaving it empty"""
+    live.update(new)
+    for key in [k for k in live if k not in new]:
+        del live[key]
+
+
+def refresh(force=False):
+    """
+    Reload the rubric files if any of them changed (checked at most every
+    CHECK_INTERVAL seconds unless force). A broken edit leaves the current
+    rubrics in place and is reported in last_error
+    Returns True if new rubrics were loaded
+    """
+    global _stamp, _last_check, last_error
+    now = time.monotonic()
+    if not force and now - _last_check < CHECK_INTERVAL:
+        return False
+    with _lock:
+        _last_check = now
+        stamp = _file_stamp()
+        if stamp == _stamp and not force:
+            return False
+        _stamp = stamp
+        try:
+            rules, levels, modules = _load()
+        except RubricError as e:
+            last_error = str(e)
+            return False
+        last_error = None
+
+        _rules.clear()
+        _rules.update(rules)
+        _levels[:] = levels
+        _evaluators.clear()
+        _replace(CRITERIA_MAP, {m: weights for m, (_, weights) in modules.items()})
+        _replace(MODULE_NAMES, {m: name for m, (name, _) in modules.items()})
+        _replace(LOCAL_EXPLAIN, {name: rule["missing"] for name, rule in rules.items()})
+        return True
+
+
+def add_dir(path):
+    """Also load rubrics from this folder (its files override earlier ones)"""
+    with _lock:
+        path = Path(path)
+        if path not in _dirs:
+            _dirs.append(path)
+        refresh(force=True)
+
+
+def snapshot(criteria):
+    """
+    The rules and feedback bands these criteria are scored with, as plain
+    data for worker processes: started with spawn (the Windows EXE), they
+    re-import this module and would see neither add_dir folders nor the
+    rubrics this process has reloaded since it started
+    """
+    with _lock:
+        return {"rules": {name: _rules[name] for name in criteria if name in _rules},
+                "levels": list(_levels)}
+
+
+def install(snap):
+    """Score with a snapshot taken in another process (called in worker processes)"""
+    with _lock:
+        _rules.update(snap["rules"])
+        _levels[:] = snap["levels"]
+        LOCAL_EXPLAIN.update({name: rule["missing"] for name, rule in snap["rules"].items()})
+        _evaluators.clear()
+
+
+def _compile(criteria):
+    """
+    Generate one function computing the raw 0-100 score of each criterion
+    Field names and points were checked when loading, so the source is safe
+    """
+    lines = ["def evaluate(a):", "    return {"]
+    for name in criteria:
+        rule = _rules.get(name)
+        if rule is None:
+            raise RubricError(f"unknown criterion {name!r}")
+        total = " + ".join(f"a.{field}" for field in rule["count"])
+        lines.append(f"        {name!r}: min(({total}) * {rule['points']!r}, 100),")
+    lines.append("    }")
+    namespace = {}
+    exec(compile("\n".join(lines), "<rubric>", "exec"), namespace)
+    return namespace["evaluate"]
+
+
+def evaluator(criteria):
+    """
+    Function SourceAnalysis -> {criterion: raw 0-100 score} for exactly
+    these criteria (a module's weights dict or any iterable of names)
+    """
+    key = tuple(criteria)
+    fn = _evaluators.get(key)
+    if fn is None:
+        with _lock:
+            fn = _evaluators.get(key) or _compile(key)
+            _evaluators[key] = fn
+    return fn
+
+
+def feedback(criterion, score):
+    """Feedback line for one criterion's raw 0-100 score"""
+    if score == 0:
+        return LOCAL_EXPLAIN.get(criterion, "❌ Missing requirement")
+    rule = _rules.get(criterion)
+    for below, text in (rule and rule["levels"]) or _levels:
+        if below is None or score < below:
+            return text.replace("{score}", str(score))
+    return f"Score: {score}/100"
+
+
+def fingerprint(criteria):
+    """
+    Short hash of how these criteria are detected and explained - part of
+    the score cache key, so editing a rule never serves stale scores
+    """
+    with _lock:
+        data = [[name, _rules.get(name)] for name in criteria]
+        data.append(_levels)
+    return hashlib.sha256(json.dumps(data, ensure_ascii=False, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+
+refresh(force=True)
+if last_error:
+    raise RubricError(last_error)
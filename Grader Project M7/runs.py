@@ -0,0 +1,152 @@
+"""
+Stored grading runs for M7Pro Grader
+Each run is saved once under runs/<run id>/ so viewing results or
+downloading files later is just a file read:
+- results.pkl   the graded DataFrame
+- feedback.json per-student feedback
+- meta.json     module, stats, chart data and export file names
+- timings.json  seconds spent in each grading stage
+- the CSV / XLSX exports (the XLSX is built on first download)
+- a Parquet export when meta names one (see columnar.py)
+"""
+import json
+import os
+import re
+import time
+from functools import lru_cache
+from pathlib import Path
+
+from timing import stage
+
+_RUN_ID = re.compile(r"^[0-9a-f]{32}$")
+
+
+def run_dir(runs_root, run_id):
+    """Folder for a run, or None if the id is malformed"""
+    if not run_id or not _RUN_ID.match(run_id):
+        return None
+    return Path(runs_root) / run_id
+
+
+def _write_atomic(path, data):
+    """Write bytes to a temp file and rename it into place"""
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def save_run(runs_root, run_id, df, feedback, meta, timings=None):
+    """
+    Store a finished run
+    timings is a timing.Timings for the run (optional)
+    meta.json is written last, so a run only counts as saved once it exists
+    """
+    folder = run_dir(runs_root, run_id)
+    folder.mkdir(parents=True, exist_ok=True)
+
+    df.to_pickle(folder / "results.pkl")
+    _write_atomic(folder / "feedback.json", json.dumps(feedback, ensure_ascii=False).encode("utf-8"))
+    if timings is not None:
+        _write_atomic(folder / "timings.json", json.dumps(timings.to_dict()).encode("utf-8"))
+
+    meta = {**meta, "run_id": run_id, "created": time.time()}
+    if meta.get("parquet_filename"):
+        from columnar import write_run   # loads pyarrow
+        with stage("parquet"):
+            write_run(folder / meta["parquet_filename"], df, feedback, meta)
+    _write_atomic(folder / "meta.json", json.dumps(meta, ensure_ascii=False).encode("utf-8"))
+    return folder
+
+
+def update_meta(runs_root, run_id, **fields):
+    """Add or change fields in a stored run's meta.json"""
+    folder = run_dir(runs_root, run_id)
+    with open(folder / "meta.json", encoding="utf-8") as f:
+        meta = json.load(f)
+    meta.update(fields)
+    _write_atomic(folder / "meta.json", json.dumps(meta, ensure_ascii=False).encode("utf-8"))
+
+
+def run_exists(runs_root, run_id):
+    folder = run_dir(runs_root, run_id)
+    return folder is not None and (folder / "meta.json").exists()
+
+
+def load_run(runs_root, run_id):
+    """
+    Load a stored run as the context for results.html
+    Returns None if the run doesn't exist
+    """
+    if not run_exists(runs_root, run_id):
+        return None
+    import pandas as pd   # heavy - loaded on the first results view, not at startup
+    folder = run_dir(runs_root, run_id)
+
+    with open(folder / "meta.json", encoding="utf-8") as f:
+        meta = json.load(f)
+    with open(folder / "feedback.json", encoding="utf-8") as f:
+        feedback = json.load(f)
+    df = pd.read_pickle(folder / "results.pkl")
+
+    return {**meta, "df": df, "feedback": feedback}
+
+
+def load_meta(runs_root, run_id):
+    """meta.json of a stored run (stats, charts, file names), or None"""
+    if not run_exists(runs_root, run_id):
+        return None
+    with open(run_dir(runs_root, run_id) / "meta.json", encoding="utf-8") as f:
+        return json.load(f)
+
+
+@lru_cache(maxsize=8)
+def _load_table(folder, saved):
+    import pandas as pd
+    df = pd.read_pickle(folder / "results.pkl")
+    with open(folder / "feedback.json", encoding="utf-8") as f:
+        feedback = json.load(f)
+    return list(df.columns), df.to_dict(orient="records"), feedback
+
+
+def load_table(runs_root, run_id):
+    """
+    (columns, rows, feedback) of a stored run for the results API, or None
+    rows are plain dicts; the last few runs stay in memory, so paging
+    through a run doesn't re-read it for every page
+    """
+    if not run_exists(runs_root, run_id):
+        return None
+    folder = run_dir(runs_root, run_id)
+    # A run saved again under the same id gets a new meta.json, and a new cache entry
+    return _load_table(folder, (folder / "meta.json").stat().st_mtime_ns)
+
+
+def query_rows(rows, sort=None, descending=False, failed_only=False, below=None, file=None):
+    """
+    Indexes of the rows that pass the filters, in display order
+    failed_only: grade 1 only; below: total_grade under this; file: name contains (any case)
+    sort: column to order by (ties keep the original order)
+    """
+    needle = file.lower() if file else None
+    keep = [i for i, row in enumerate(rows)
+            if (not failed_only or row.get("total_grade") == 1)
+            and (below is None or row.get("total_grade", 0) < below)
+            and (needle is None or needle in str(row.get("file", "")).lower())]
+    if sort:
+        # Missing values always go last, whichever way we sort
+        present = [i for i in keep if rows[i].get(sort) is not None]
+        missing = [i for i in keep if rows[i].get(sort) is None]
+        present.sort(key=lambda i: rows[i][sort], reverse=descending)
+        keep = present + missing
+    return keep
+
+
+def load_timings(runs_root, run_id):
+    """Stage timings stored with a run ({} if there are none)"""
+    folder = run_dir(runs_root, run_id)
+    try:
+        with open(folder / "timings.json", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError, TypeError):
+        return {}
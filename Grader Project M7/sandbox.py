@@ -0,0 +1,263 @@
+"""
+Sandboxed execution for M7Pro Grader
+Runs a student program (or the instructor's solution) with scripted stdin
+in a separate, resource-limited Python interpreter and captures what it
+prints. Interpreters are started ahead of time and kept in a pool, so a run
+only pays for the program itself, not for starting Python
+
+Every interpreter runs exactly ONE program and then exits - nothing a
+submission does (globals, open files, monkeypatching) can leak into the next
+Limits (POSIX): CPU seconds, address space, file size, no child processes;
+every platform: wall-clock timeout, no network modules, a throwaway working
+directory. This keeps honest mistakes (infinite loops, huge lists, stray
+files) contained; it is not a security boundary against hostile code - the
+module blocks live in the same interpreter, and a submission can undo them
+(del sys.modules[...], import posix). That is why app.py only runs
+submissions with M7PRO_EXECUTION=1, meant for a grader that is itself
+isolated (container or VM without network)
+"""
+import atexit
+import difflib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+# Per-run limits
+TIMEOUT_SECONDS = 3.0               # wall clock, enforced by the parent
+CPU_SECONDS = 2                     # RLIMIT_CPU
+MEMORY_BYTES = 256 * 1024 * 1024    # RLIMIT_AS
+FILE_BYTES = 1024 * 1024            # RLIMIT_FSIZE - largest file a program may write
+OUTPUT_CHARS = 64 * 1024            # printed output kept for comparison
+
+# Stdin used when the instructor gives no fixtures
+DEFAULT_FIXTURES = [
+    "5\n3\n2\n1\n0\n",
+    "10\n20\n30\nyes\nno\n0\n",
+]
+
+# Line that separates fixtures in the upload form
+FIXTURE_SEPARATOR = "---"
+
+# Code run by every pooled interpreter. It imports what it needs, then
+# blocks on stdin until a job arrives - that is the "pre-warmed" part
+_RUNNER = r'''
+import builtins, io, json, os, sys
+job = json.loads(sys.stdin.read())
+
+try:
+    import resource
+except ImportError:
+    resource = None
+if resource is not None:
+    for name, value in (("RLIMIT_CPU", job["cpu"]), ("RLIMIT_AS", job["memory"]),
+                        ("RLIMIT_FSIZE", job["file_bytes"]), ("RLIMIT_NPROC", 0)):
+        limit = getattr(resource, name, None)
+        if limit is not None:
+            try:
+                resource.setrlimit(limit, (value, value))
+            except (ValueError, OSError):
+                pass
+
+# No network, no child processes, no native calls
+for name in ("socket", "_socket", "ssl", "_ssl", "select", "selectors", "subprocess",
+             "_posixsubprocess", "multiprocessing", "ctypes", "_ctypes", "urllib.request",
+             "http.client", "asyncio"):
+    sys.modules[name] = None
+os.chdir(job["cwd"])
+for name in ("system", "popen", "fork", "forkpty", "kill", "killpg",
+             "execv", "execve", "execvp", "execvpe", "spawnv", "spawnve"):
+    os.__dict__.pop(name, None)
+
+class Capped(io.StringIO):
+    def write(self, s):
+        room = job["output_chars"] - self.tell()
+        if room > 0:
+            super().write(s[:room])
+        return len(s)
+
+out = Capped()
+lines = io.StringIO(job["stdin"])
+
+def scripted_input(prompt=""):
+    # Prompts are not part of the output - students word them differently
+    line = lines.readline()
+    if not line:
+        raise EOFError("no more input")
+    return line.rstrip("\n")
+
+builtins.input = scripted_input
+real_stdout = sys.stdout
+sys.stdout = out
+sys.stderr = io.StringIO()
+sys.stdin = lines
+
+error = None
+try:
+    exec(compile(job["source"], "<submission>", "exec", dont_inherit=True), {"__name__": "__main__"})
+except SystemExit:
+    pass
+except BaseException as e:
+    error = type(e).__name__
+
+real_stdout.write("\n" + json.dumps({"output": out.getvalue(), "error": error}))
+real_stdout.flush()
+'''
+
+
+class RunResult:
+    """What one sandboxed run printed, and how it ended"""
+
+    def __init__(self, output="", error=None, timed_out=False):
+        self.output = output
+        self.error = error
+        self.timed_out = timed_out
+
+    @property
+    def ok(self):
+        return self.error is None and not self.timed_out
+
+
+def available():
+    """
+    Execution needs a real Python interpreter to start - inside the
+    PyInstaller EXE sys.executable is the app itself, so grading stays static
+    """
+    return not getattr(sys, "frozen", False) and bool(sys.executable)
+
+
+class SandboxPool:
+    """
+    Pool of idle, pre-started interpreters
+    run() takes one, hands it a program and starts a replacement right away
+    """
+
+    def __init__(self, size=None, python=None):
+        self.size = size or os.cpu_count() or 1
+        self.python = python or sys.executable
+        self._idle = deque()
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def _spawn(self):
+        return subprocess.Popen(
+            [self.python, "-I", "-S", "-c", _RUNNER],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+            cwd=tempfile.gettempdir(),
+        )
+
+    def warm(self):
+        """Fill the pool up to its size"""
+        with self._lock:
+            while not self._closed and len(self._idle) < self.size:
+                self._idle.append(self._spawn())
+
+    def _take(self):
+        with self._lock:
+            proc = self._idle.popleft() if self._idle else self._spawn()
+            # Refill now so the interpreter is ready by the next run
+            if not self._closed:
+                self._idle.append(self._spawn())
+        return proc
+
+    def run(self, source, stdin="", timeout=TIMEOUT_SECONDS):
+        """Run one program with the given stdin; returns a RunResult"""
+        cwd = tempfile.mkdtemp(prefix="m7pro_run_")
+        proc = self._take()
+        job = json.dumps({
+            "source": source, "stdin": stdin, "cwd": cwd,
+            "cpu": CPU_SECONDS, "memory": MEMORY_BYTES,
+            "file_bytes": FILE_BYTES, "output_chars": OUTPUT_CHARS,
+        }).encode("utf-8")
+        try:
+            try:
+                out, _ = proc.communicate(job, timeout=timeout)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+                proc.communicate()
+                return RunResult(timed_out=True)
+
+            # The result is the last line; anything before it was written
+            # straight to the real stdout and is ignored
+            last = out.rstrip(b"\n").rsplit(b"\n", 1)[-1]
+            try:
+                data = json.loads(last.decode("utf-8"))
+                return RunResult(data["output"], data["error"])
+            except (ValueError, KeyError, TypeError):
+                # Killed by a resource limit (CPU -> SIGXCPU, memory -> crash)
+                return RunResult(error="ResourceLimit")
+        finally:
+            shutil.rmtree(cwd, ignore_errors=True)
+
+    def run_many(self, jobs, progress=None):
+        """
+        Run (source, stdin) pairs, up to pool-size at a time
+        Results come back in the same order; progress(n) after each one
+        """
+        results = [None] * len(jobs)
+        done = 0
+        with ThreadPoolExecutor(max_workers=self.size) as ex:
+            futures = {ex.submit(self.run, src, stdin): i for i, (src, stdin) in enumerate(jobs)}
+            for future in futures:
+                results[futures[future]] = future.result()
+                done += 1
+                if progress:
+                    progress(done)
+        return results
+
+    def close(self):
+        """Stop the idle interpreters"""
+        with self._lock:
+            self._closed = True
+            while self._idle:
+                proc = self._idle.popleft()
+                proc.kill()
+                proc.wait()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Shared pool, started on first use"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = SandboxPool()
+            _pool.warm()
+            atexit.register(_pool.close)
+        return _pool
+
+
+def parse_fixtures(text):
+    """
+    Split the upload form's fixture text into one stdin string per run
+    Runs are separated by a line containing only ---
+    """
+    fixtures, current = [], []
+    for line in (text or "").replace("\r\n", "\n").split("\n"):
+        if line.strip() == FIXTURE_SEPARATOR:
+            fixtures.append(current)
+            current = []
+        else:
+            current.append(line)
+    fixtures.append(current)
+    fixtures = ["\n".join(lines).strip("\n") + "\n" for lines in fixtures if any(l.strip() for l in lines)]
+    return fixtures or list(DEFAULT_FIXTURES)
+
+
+def output_similarity(expected, actual):
+    """
+    0-1 similarity of two program outputs
+    Compared word by word, so spacing and line breaks don't matter
+    """
+    a, b = expected.split(), actual.split()
+    if not a and not b:
+        return 1.0
+    return difflib.SequenceMatcher(None, a, b, autojunk=False).ratio()
@@ -0,0 +1,125 @@
+"""
+Persistent score cache for M7Pro Grader
+Stores full _score results in SQLite so re-uploading the same
+submissions doesn't rescore files that haven't changed
+- Key: hash of file content + module criteria weights + grader.scoring_version
+- Value: the _score result (JSON)
+- Size-based LRU eviction and hit/miss counters
+"""
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+# SQLite limits how many ? parameters one statement may use
+_BATCH = 500
+
+
+def make_key(content, criteria, version):
+    """Content-addressed cache key for one file under one rubric"""
+    h = hashlib.sha256()
+    h.update(str(version).encode())
+    h.update(json.dumps(list(criteria.items())).encode())
+    h.update(b"\0")
+    h.update(content.encode("utf-8", "surrogatepass"))
+    return h.hexdigest()
+
+
+class ScoreCache:
+    """SQLite-backed LRU cache of _score results"""
+
+    def __init__(self, path, max_bytes=64 * 1024 * 1024):
+        self.path = str(path)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS scores ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " last_used REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS scores_last_used ON scores (last_used)")
+        self._db.commit()
+
+    def get_many(self, keys):
+        """Return {key: result} for every key that is cached"""
+        found = {}
+        keys = list(dict.fromkeys(keys))
+        now = time.time()
+        with self._lock:
+            for i in range(0, len(keys), _BATCH):
+                batch = keys[i:i + _BATCH]
+                marks = ",".join("?" * len(batch))
+                rows = self._db.execute(
+                    f"SELECT key, value FROM scores WHERE key IN ({marks})", batch
+                ).fetchall()
+                for key, value in rows:
+                    found[key] = json.loads(value)
+                if rows:
+                    self._db.execute(
+                        f"UPDATE scores SET last_used = ? WHERE key IN ({marks})", [now, *batch]
+                    )
+            self._db.commit()
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def put_many(self, items):
+        """Store {key: result} pairs, then evict least recently used entries"""
+        now = time.time()
+        rows = []
+        for key, result in items.items():
+            value = json.dumps(result)
+            rows.append((key, value, len(value), now))
+        if not rows:
+            return
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO scores (key, value, size, last_used) VALUES (?, ?, ?, ?)", rows
+            )
+            self._evict()
+            self._db.commit()
+
+    def _evict(self):
+        """Drop the oldest entries until the cache fits in max_bytes"""
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM scores").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Evict down to 90% so we don't evict again on the very next put
+        excess = total - int(self.max_bytes * 0.9)
+        freed = 0
+        doomed = []
+        for key, size in self._db.execute("SELECT key, size FROM scores ORDER BY last_used"):
+            doomed.append((key,))
+            freed += size
+            if freed >= excess:
+                break
+        self._db.executemany("DELETE FROM scores WHERE key = ?", doomed)
+
+    def clear(self):
+        """Remove every cached score"""
+        with self._lock:
+            self._db.execute("DELETE FROM scores")
+            self._db.commit()
+
+    def stats(self):
+        """Hit/miss counters plus current size of the cache"""
+        with self._lock:
+            entries, size = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM scores"
+            ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups * 100, 1) if lookups else 0,
+            "entries": entries,
+            "bytes": size,
+            "max_bytes": self.max_bytes,
+        }
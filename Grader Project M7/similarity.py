@@ -0,0 +1,297 @@
+"""
+Near-duplicate detection for M7Pro Grader
+Finds submissions that are (almost) the same program without comparing
+every pair of files:
+- each file's AST is flattened to a token stream with identifiers renamed
+  and comments / docstrings dropped, so renaming variables doesn't hide a copy
+- the stream is cut into overlapping shingles and summarized by a MinHash
+  signature (estimates Jaccard similarity of the shingle sets)
+- signatures are split into LSH bands; only files sharing a band bucket are
+  compared, which keeps the work close to linear in the number of files
+Signatures are kept in SQLite so later runs are checked against past ones
+without reprocessing them
+numpy is imported inside the functions that need it, so importing this
+module at app startup stays cheap
+"""
+import ast
+import builtins
+import hashlib
+import keyword
+import random
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from functools import lru_cache
+
+# MinHash / LSH parameters - BANDS * ROWS must equal NUM_PERM
+NUM_PERM = 128
+BANDS = 16
+ROWS = 8                # with 16 x 8, pairs above ~0.7 are very likely to become candidates
+SHINGLE_SIZE = 5        # tokens per shingle
+MIN_SHINGLES = 20       # tiny files all look alike, so they are not checked
+MAX_CHARS = 50_000      # parsing huge files is slow, and padding a copy lowers its score anyway
+THRESHOLD = 0.8         # estimated Jaccard similarity that gets reported
+MAX_PAIRS = 500         # most similar pairs kept for the report
+_SEED = 221
+
+# Stored with every signature; signatures made with other parameters are ignored
+SCHEME = f"minhash-{NUM_PERM}x{SHINGLE_SIZE}-{_SEED}"
+
+_PRIME = (1 << 31) - 1
+
+# Shingles hashed per batch, to bound the size of the permutation matrix
+_CHUNK = 4096
+
+# Names a student can't rename away (print, input, range, ...)
+_BUILTINS = frozenset(dir(builtins))
+
+_WORD = re.compile(r"[A-Za-z_]\w*|\d+|\S")
+_COMMENT = re.compile(r"#[^\n]*")
+
+# SQLite limits how many ? parameters one statement may use
+_BATCH = 500
+
+# Candidate pairs compared per numpy batch
+_PAIR_BATCH = 65536
+
+
+@lru_cache(maxsize=1)
+def _permutations():
+    """The (a, b) coefficients of the NUM_PERM hash permutations"""
+    import numpy as np
+    rng = random.Random(_SEED)
+    a = np.array([rng.randrange(1, _PRIME) for _ in range(NUM_PERM)], dtype=np.uint64)
+    b = np.array([rng.randrange(0, _PRIME) for _ in range(NUM_PERM)], dtype=np.uint64)
+    return a, b
+
+
+def _name(name):
+    return name if name in _BUILTINS else "ID"
+
+
+def normalize_tokens(src):
+    """
+    Token stream of a program's structure: AST node types in source order,
+    with identifiers renamed to ID and literal values reduced to their type
+    Files that don't parse fall back to a plain token scan, and so do files
+    the parser can't handle (x = ------...1 runs it out of memory / stack)
+    """
+    try:
+        tree = ast.parse(src)
+    except (SyntaxError, ValueError, MemoryError, RecursionError):
+        return [w if keyword.iskeyword(w) or not w[0].isalpha() and w[0] != "_" else _name(w)
+                for w in _WORD.findall(_COMMENT.sub("", src))]
+
+    tokens = []
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        # Bare string statements are docstrings / commented-out code
+        if (isinstance(node, ast.Expr) and isinstance(node.value, ast.Constant)
+                and isinstance(node.value.value, str)):
+            continue
+        if isinstance(node, ast.expr_context):
+            continue
+        tokens.append(type(node).__name__)
+        if isinstance(node, ast.Name):
+            tokens.append(_name(node.id))
+        elif isinstance(node, ast.Attribute):
+            tokens.append(node.attr)
+        elif isinstance(node, ast.Constant):
+            tokens.append(type(node.value).__name__)
+        # Reversed so children come off the stack in source order
+        stack.extend(reversed(list(ast.iter_child_nodes(node))))
+    return tokens
+
+
+def shingles(tokens):
+    """Unique 32-bit hashes of every SHINGLE_SIZE-token window"""
+    import numpy as np
+    if len(tokens) < SHINGLE_SIZE:
+        return np.empty(0, dtype=np.uint64)
+    hashes = {zlib.crc32("\x1f".join(tokens[i:i + SHINGLE_SIZE]).encode("utf-8"))
+              for i in range(len(tokens) - SHINGLE_SIZE + 1)}
+    return np.fromiter(hashes, dtype=np.uint64, count=len(hashes))
+
+
+def minhash(shingle_hashes):
+    """NUM_PERM-value MinHash signature of a shingle set"""
+    import numpy as np
+    a, b = _permutations()
+    sig = np.full(NUM_PERM, _PRIME, dtype=np.uint64)
+    for i in range(0, len(shingle_hashes), _CHUNK):
+        x = shingle_hashes[i:i + _CHUNK]
+        # (a * x + b) mod p for every permutation x every shingle
+        np.minimum(sig, ((a[:, None] * x[None, :] + b[:, None]) % _PRIME).min(axis=1), out=sig)
+    return sig.astype(np.uint32)
+
+
+def signature(src):
+    """MinHash signature of a program, or None if it is too small or too big to judge"""
+    if len(src) > MAX_CHARS:
+        return None
+    hashes = shingles(normalize_tokens(src))
+    if len(hashes) < MIN_SHINGLES:
+        return None
+    return minhash(hashes)
+
+
+def band_keys(sig):
+    """One 64-bit LSH bucket id per band (the band number is part of the hash)"""
+    keys = []
+    for b in range(BANDS):
+        digest = hashlib.blake2b(sig[b * ROWS:(b + 1) * ROWS].tobytes(), digest_size=8,
+                                 person=b.to_bytes(2, "little")).digest()
+        keys.append(int.from_bytes(digest, "little", signed=True))
+    return keys
+
+
+def estimate(sig_a, sig_b):
+    """Estimated Jaccard similarity of two signatures"""
+    import numpy as np
+    return float(np.count_nonzero(sig_a == sig_b)) / NUM_PERM
+
+
+class SimilarityIndex:
+    """SQLite store of past signatures and their LSH buckets"""
+
+    def __init__(self, path):
+        self.path = str(path)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS signatures ("
+            " id INTEGER PRIMARY KEY,"
+            " scheme TEXT NOT NULL,"
+            " course TEXT NOT NULL,"
+            " module TEXT NOT NULL,"
+            " file TEXT NOT NULL,"
+            " sha256 TEXT NOT NULL,"
+            " run_id TEXT NOT NULL,"
+            " created REAL NOT NULL,"
+            " signature BLOB NOT NULL,"
+            " UNIQUE (scheme, course, module, file, sha256))"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS bands ("
+            " bucket INTEGER NOT NULL,"
+            " sig_id INTEGER NOT NULL REFERENCES signatures (id))"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS bands_bucket ON bands (bucket)")
+        self._db.commit()
+
+    def query(self, keys, module):
+        """
+        Past signatures for this module sharing at least one bucket with keys
+        Returns ({bucket: [ids]}, {id: (course, file, run_id, signature)})
+        """
+        import numpy as np
+        keys = list(dict.fromkeys(keys))
+        buckets = {}
+        with self._lock:
+            for i in range(0, len(keys), _BATCH):
+                batch = keys[i:i + _BATCH]
+                marks = ",".join("?" * len(batch))
+                for bucket, sig_id in self._db.execute(
+                        f"SELECT bucket, sig_id FROM bands WHERE bucket IN ({marks})", batch):
+                    buckets.setdefault(bucket, []).append(sig_id)
+            found = {}
+            ids = list({i for ids in buckets.values() for i in ids})
+            for i in range(0, len(ids), _BATCH):
+                batch = ids[i:i + _BATCH]
+                marks = ",".join("?" * len(batch))
+                for sig_id, course, file, run_id, blob in self._db.execute(
+                        f"SELECT id, course, file, run_id, signature FROM signatures"
+                        f" WHERE id IN ({marks}) AND scheme = ? AND module = ?", [*batch, SCHEME, module]):
+                    found[sig_id] = (course, file, run_id, np.frombuffer(blob, dtype=np.uint32))
+        return buckets, found
+
+    def add(self, entries, course, module, run_id):
+        """Store (file, sha256, signature, band keys) entries from one run"""
+        now = time.time()
+        with self._lock:
+            for file, sha, sig, keys in entries:
+                cur = self._db.execute(
+                    "INSERT OR IGNORE INTO signatures"
+                    " (scheme, course, module, file, sha256, run_id, created, signature)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (SCHEME, course, module, file, sha, run_id, now, sig.tobytes()))
+                if cur.rowcount:
+                    self._db.executemany("INSERT INTO bands (bucket, sig_id) VALUES (?, ?)",
+                                         [(k, cur.lastrowid) for k in keys])
+            self._db.commit()
+
+    def count(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM signatures").fetchone()[0]
+
+
+def find_similar(sources, course="default", module="", run_id="", index=None,
+                 threshold=THRESHOLD, max_pairs=MAX_PAIRS):
+    """
+    Near-duplicate pairs among (file name, content) sources, and between
+    them and past runs stored in index (a SimilarityIndex, optional)
+    Past files of this course whose name is in this upload are skipped:
+    they are a student's own earlier version, and any copy between two
+    of them is already reported from this upload. The new signatures are
+    added to the index afterwards
+    Returns {"checked", "skipped", "threshold", "total_pairs", "pairs": [...]},
+    with the max_pairs most similar pairs, most similar first
+    """
+    import numpy as np
+    entries = []
+    for name, content in sources:
+        sig = signature(content)
+        if sig is not None:
+            sha = hashlib.sha256(content.encode("utf-8", "surrogatepass")).hexdigest()
+            entries.append((name, sha, sig, band_keys(sig)))
+
+    pairs = []
+
+    # Inside this upload: files sharing a bucket become candidates
+    buckets = {}
+    candidates = set()
+    for i, (_, _, _, keys) in enumerate(entries):
+        for key in keys:
+            for j in buckets.setdefault(key, []):
+                candidates.add((j, i))
+            buckets[key].append(i)
+    if candidates:
+        # Score every candidate pair at once, a batch at a time
+        sigs = np.stack([e[2] for e in entries])
+        candidates = np.array(sorted(candidates))
+        for n in range(0, len(candidates), _PAIR_BATCH):
+            i, j = candidates[n:n + _PAIR_BATCH].T
+            scores = np.count_nonzero(sigs[i] == sigs[j], axis=1) / NUM_PERM
+            hit = scores >= threshold
+            for a, b, score in zip(i[hit], j[hit], scores[hit]):
+                pairs.append({"file": entries[a][0], "other_file": entries[b][0],
+                              "other_run": None, "other_course": None, "similarity": round(float(score), 3)})
+
+    # Against earlier runs
+    if index is not None and entries:
+        uploaded = {name for name, _ in sources}
+        past_buckets, past = index.query([k for e in entries for k in e[3]], module)
+        for name, _, sig, keys in entries:
+            ids = {i for k in keys for i in past_buckets.get(k, ()) if i in past}
+            for p_course, p_file, p_run, p_sig in map(past.get, sorted(ids)):
+                if p_course == course and p_file in uploaded:
+                    continue
+                score = estimate(sig, p_sig)
+                if score >= threshold:
+                    pairs.append({"file": name, "other_file": p_file,
+                                  "other_run": p_run, "other_course": p_course,
+                                  "similarity": round(score, 3)})
+        index.add(entries, course, module, run_id)
+
+    pairs.sort(key=lambda p: (-p["similarity"], p["file"], p["other_file"]))
+    return {
+        "checked": len(entries),
+        "skipped": len(sources) - len(entries),
+        "threshold": threshold,
+        "total_pairs": len(pairs),
+        "pairs": pairs[:max_pairs],
+    }
@@ -0,0 +1,8 @@
+"""
+The app is a flat folder of modules (app.py, grader.py, ...), so the
+tests import them from the folder above
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,146 @@
+"""
+Chunked uploads: the local header scan (ZIP checks while bytes arrive),
+offsets, and resuming after a restart
+"""
+import hashlib
+import io
+import zipfile
+
+import pytest
+
+import chunked_upload
+from chunked_upload import LocalHeaderScan, UploadConflict, UploadError
+from grader import ZIP_MAX_RATIO, ZIP_RATIO_MIN_BYTES
+
+PROGRAM = 'name = input("Name: ")\nprint("Hello", name)\n'
+
+
+def make_zip(files, force_zip64=False):
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as z:
+        for name, content in files.items():
+            with z.open(name, "w", force_zip64=force_zip64) as f:
+                f.write(content.encode("utf-8"))
+    return buf.getvalue()
+
+
+class _Unseekable(io.RawIOBase):
+    """Write-only stream: zipfile then streams members with data descriptors (flag 0x08)"""
+
+    def __init__(self):
+        self.data = bytearray()
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self.data += b
+        return len(b)
+
+
+def scan(data):
+    s = LocalHeaderScan()
+    s.advance(io.BytesIO(data), len(data))
+    return s
+
+
+@pytest.fixture(autouse=True)
+def _forget_uploads():
+    chunked_upload._uploads.clear()
+    yield
+    chunked_upload._uploads.clear()
+
+
+def test_scan_counts_python_members():
+    s = scan(make_zip({"a.py": PROGRAM, "b.py": PROGRAM * 2, "notes.txt": "x"}))
+    assert s.done
+    assert (s.members, s.python_files, s.declared) == (3, 2, len(PROGRAM) * 3)
+
+
+def test_scan_waits_for_a_whole_header():
+    data = make_zip({"a.py": PROGRAM})
+    s = LocalHeaderScan()
+    s.advance(io.BytesIO(data), 20)
+    assert (s.members, s.done) == (0, False)
+    s.advance(io.BytesIO(data), len(data))
+    assert s.python_files == 1
+
+
+def test_non_zip_first_header_is_rejected():
+    with pytest.raises(UploadError, match="not a ZIP"):
+        scan(b"this is no zip archive at all, just text")
+
+
+def test_zip64_extra_field_gives_the_real_sizes():
+    data = make_zip({"a.py": PROGRAM, "b.py": PROGRAM}, force_zip64=True)
+    assert b"\x01\x00" in data      # the zip64 extra field tag
+    s = scan(data)
+    assert (s.members, s.declared) == (2, len(PROGRAM) * 2)
+
+
+def test_streamed_member_ends_the_scan():
+    out = _Unseekable()
+    with zipfile.ZipFile(out, "w", zipfile.ZIP_DEFLATED) as z:
+        z.writestr("a.py", PROGRAM)
+        z.writestr("b.py", PROGRAM)
+    data = bytes(out.data)
+    assert zipfile.ZipFile(io.BytesIO(data)).infolist()[0].flag_bits & 0x08
+    s = scan(data)
+    # Sizes come after the data, so the scan stops at the first member
+    assert s.done and s.members == 1
+
+
+def test_over_ratio_member_is_rejected():
+    data = make_zip({"bomb.py": "#" * (ZIP_RATIO_MIN_BYTES * 2)})
+    assert ZIP_RATIO_MIN_BYTES * 2 > ZIP_MAX_RATIO * len(data)
+    with pytest.raises(UploadError, match="compression ratio"):
+        scan(data)
+
+
+def test_offset_conflict_reports_where_the_upload_stands(tmp_path):
+    data = make_zip({"a.py": PROGRAM})
+    upload = chunked_upload.start(tmp_path, "s.zip", len(data))
+    upload.write(0, io.BytesIO(data[:10]), 10)
+    with pytest.raises(UploadConflict) as e:
+        upload.write(0, io.BytesIO(data[:10]), 10)
+    assert e.value.offset == 10
+    with pytest.raises(UploadConflict):
+        upload.write(20, io.BytesIO(data[20:30]), 10)
+    assert upload.received == 10
+
+
+def test_resume_from_part_file_after_restart(tmp_path):
+    data = make_zip({f"s{i}.py": PROGRAM * (i + 1) for i in range(5)})
+    sha = hashlib.sha256(data).hexdigest()
+    upload = chunked_upload.start(tmp_path, "s.zip", len(data), sha)
+    half = len(data) // 2
+    upload.write(0, io.BytesIO(data[:half]), half)
+
+    chunked_upload._uploads.clear()     # the server restarts
+    resumed = chunked_upload.get(tmp_path, upload.id)
+    assert resumed is not upload
+    assert resumed.received == half
+    assert resumed.scan.members == upload.scan.members
+
+    resumed.write(half, io.BytesIO(data[half:]), len(data) - half)
+    assert resumed.complete
+    assert resumed.sha256 == sha
+    assert resumed.zip_path.read_bytes() == data
+
+
+def test_sha256_mismatch_rejects_the_upload(tmp_path):
+    data = make_zip({"a.py": PROGRAM})
+    upload = chunked_upload.start(tmp_path, "s.zip", len(data), "0" * 64)
+    with pytest.raises(UploadError, match="SHA-256"):
+        upload.write(0, io.BytesIO(data), len(data))
+    assert upload.rejected and not upload.complete
+
+
+def test_graded_upload_is_not_pending(tmp_path):
+    data = make_zip({"a.py": PROGRAM})
+    upload = chunked_upload.start(tmp_path, "s.zip", len(data))
+    assert chunked_upload.pending(upload.folder)
+    upload.write(0, io.BytesIO(data), len(data))
+    chunked_upload.release(upload, graded=True)
+    assert not chunked_upload.pending(upload.folder)
+    assert chunked_upload.get(tmp_path, upload.id) is None
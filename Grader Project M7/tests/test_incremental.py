@@ -0,0 +1,90 @@
+"""
+Incremental regrading: a re-uploaded ZIP, graded against the manifest of
+the previous upload, must give the same table as grading it from scratch
+"""
+import zipfile
+
+import pytest
+
+import rubrics
+from grader import grade_zip, grade_zip_incremental, scoring_version
+from manifest import load_manifest, save_manifest
+
+FIRST = {
+    "alice/hello.py": 'name = input("Name: ")\nprint("Hello", name)\n',
+    "bob/hello.py": 'print("Hello")\n',
+    "carol/hello.py": 'for i in range(3):\n    print(i)\n',
+    "dave/hello.py": 'x = 1\nif x > 0:\n    print("positive")\n',
+}
+
+
+@pytest.fixture(scope="module")
+def criteria():
+    rubrics.refresh()
+    return rubrics.CRITERIA_MAP["M3"]
+
+
+def write_zip(path, files):
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as z:
+        for name, content in files.items():
+            z.writestr(name, content)
+    return path
+
+
+def regrade(tmp_path, criteria, zip_path):
+    path = tmp_path / "manifest.json"
+    manifest = load_manifest(path, criteria, scoring_version(criteria))
+    df, feedback, changes = grade_zip_incremental(zip_path, criteria, manifest)
+    save_manifest(path, manifest)
+    return df, feedback, changes
+
+
+def test_first_upload_matches_a_full_grade(tmp_path, criteria):
+    zip_path = write_zip(tmp_path / "v1.zip", FIRST)
+    df, feedback, changes = regrade(tmp_path, criteria, zip_path)
+    full_df, full_feedback = grade_zip(zip_path, criteria)
+    assert changes["first_upload"]
+    assert sorted(changes["added"]) == sorted(FIRST)
+    assert df.equals(full_df)
+    assert feedback == full_feedback
+
+
+def test_regrade_matches_a_full_grade(tmp_path, criteria):
+    regrade(tmp_path, criteria, write_zip(tmp_path / "v1.zip", FIRST))
+
+    second = dict(FIRST)
+    del second["bob/hello.py"]
+    second["carol/hello.py"] = 'name = input("Name: ")\nwhile name:\n    print(name)\n    name = ""\n'
+    second["erin/hello.py"] = 'age = int(input("Age: "))\nprint("Next year:", age + 1)\n'
+    zip_path = write_zip(tmp_path / "v2.zip", second)
+
+    df, feedback, changes = regrade(tmp_path, criteria, zip_path)
+    full_df, full_feedback = grade_zip(zip_path, criteria)
+    assert not changes["first_upload"]
+    assert changes["added"] == ["erin/hello.py"]
+    assert changes["modified"] == ["carol/hello.py"]
+    assert changes["removed"] == ["bob/hello.py"]
+    assert changes["unchanged"] == 2
+    assert df.equals(full_df)
+    assert feedback == full_feedback
+
+
+def test_same_zip_again_scores_nothing(tmp_path, criteria):
+    zip_path = write_zip(tmp_path / "v1.zip", FIRST)
+    first_df, _, _ = regrade(tmp_path, criteria, zip_path)
+    df, _, changes = regrade(tmp_path, criteria, zip_path)
+    assert (changes["added"], changes["modified"], changes["removed"]) == ([], [], [])
+    assert changes["unchanged"] == len(FIRST)
+    assert df.equals(first_df)
+
+
+def test_changed_weights_rescore_everything(tmp_path, criteria):
+    zip_path = write_zip(tmp_path / "v1.zip", FIRST)
+    regrade(tmp_path, criteria, zip_path)
+    reweighted = {k: v * 2 for k, v in criteria.items()}
+    manifest = load_manifest(tmp_path / "manifest.json", reweighted, scoring_version(reweighted))
+    assert not manifest["reusable"]
+    df, feedback, _ = grade_zip_incremental(zip_path, reweighted, manifest)
+    full_df, full_feedback = grade_zip(zip_path, reweighted)
+    assert df.equals(full_df)
+    assert feedback == full_feedback
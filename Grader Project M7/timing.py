@@ -0,0 +1,139 @@
+"""
+Stage timers for M7Pro Grader
+Wrap a stage in `with stage("excel"):` and its duration is recorded in:
+- a process-wide histogram per stage, served as Prometheus text on /metrics
+- the Timings of the run being graded (if one is active), which is stored
+  with the run as timings.json and sent as a Server-Timing header
+Set M7PRO_TIMING=0 to turn timing off; stage() is then a shared no-op
+"""
+import contextlib
+import contextvars
+import os
+import threading
+import time
+
+ENABLED = os.environ.get("M7PRO_TIMING", "1") != "0"
+
+# Histogram bucket upper bounds, in seconds
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+_lock = threading.Lock()
+_histograms = {}    # stage -> [count per bucket..., +Inf count, sum]
+_current = contextvars.ContextVar("m7pro_timings", default=None)
+_NOOP = contextlib.nullcontext()
+
+
+class Timings:
+    """Total time and number of calls per stage, for one run or request"""
+
+    def __init__(self):
+        self.stages = {}
+        self._lock = threading.Lock()
+
+    def add(self, name, seconds):
+        with self._lock:
+            total, calls = self.stages.get(name, (0.0, 0))
+            self.stages[name] = (total + seconds, calls + 1)
+
+    def to_dict(self):
+        with self._lock:
+            return {name: {"seconds": round(total, 6), "calls": calls}
+                    for name, (total, calls) in self.stages.items()}
+
+    def server_timing(self, prefix=""):
+        """Server-Timing header value (durations in milliseconds)"""
+        with self._lock:
+            items = list(self.stages.items())
+        return ", ".join(f"{prefix}{name};dur={total * 1000:.1f}" for name, (total, _) in items)
+
+
+def observe(name, seconds):
+    """Record one stage duration"""
+    with _lock:
+        h = _histograms.get(name)
+        if h is None:
+            h = _histograms[name] = [0] * (len(BUCKETS) + 1) + [0.0]
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                h[i] += 1
+                break
+        else:
+            h[len(BUCKETS)] += 1
+        h[-1] += seconds
+    timings = _current.get()
+    if timings is not None:
+        timings.add(name, seconds)
+
+
+class _Stage:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        observe(self.name, time.perf_counter() - self.start)
+        return False
+
+
+def stage(name):
+    """Context manager that times one stage"""
+    if not ENABLED:
+        return _NOOP
+    return _Stage(name)
+
+
+def activate(timings):
+    """Record every stage run in this context into timings as well; returns a token for deactivate"""
+    return _current.set(timings)
+
+
+def deactivate(token):
+    _current.reset(token)
+
+
+def current():
+    """The Timings being recorded into, or None"""
+    return _current.get()
+
+
+@contextlib.contextmanager
+def collect(timings):
+    """activate() for the duration of a with block"""
+    token = activate(timings)
+    try:
+        yield timings
+    finally:
+        deactivate(token)
+
+
+def render_metrics(extra=None):
+    """
+    Prometheus text exposition of every stage histogram
+    extra: {metric name: (type, help, value)} appended as-is
+    """
+    lines = [
+        "# HELP m7pro_stage_duration_seconds Time spent in each grading stage",
+        "# TYPE m7pro_stage_duration_seconds histogram",
+    ]
+    with _lock:
+        snapshot = {name: list(h) for name, h in _histograms.items()}
+    for name in sorted(snapshot):
+        h = snapshot[name]
+        cumulative = 0
+        for bound, n in zip(BUCKETS, h):
+            cumulative += n
+            lines.append(f'm7pro_stage_duration_seconds_bucket{{stage="{name}",le="{bound}"}} {cumulative}')
+        cumulative += h[len(BUCKETS)]
+        lines.append(f'm7pro_stage_duration_seconds_bucket{{stage="{name}",le="+Inf"}} {cumulative}')
+        lines.append(f'm7pro_stage_duration_seconds_sum{{stage="{name}"}} {h[-1]:.6f}')
+        lines.append(f'm7pro_stage_duration_seconds_count{{stage="{name}"}} {cumulative}')
+    for metric, (kind, help_text, value) in (extra or {}).items():
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} {kind}")
+        lines.append(f"{metric} {value}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,89 @@
+"""
+Per-run workspaces for M7Pro Grader
+Every upload gets its own folder (runs/<run id>/) for the ZIP (deleted once
+it is graded), the solution file and the stored results, so concurrent
+instructors, threads and worker processes never share or delete each
+other's files
+"""
+import os
+import shutil
+import time
+import uuid
+from pathlib import Path
+
+# Old runs are removed once they pass either limit; only finished runs
+# count towards the size (see cleanup_workspaces)
+MAX_AGE_SECONDS = 7 * 24 * 3600
+MAX_TOTAL_BYTES = int(float(os.environ.get("M7PRO_RUNS_MAX_GB", 2)) * 1024 ** 3)
+
+
+def create_workspace(root):
+    """
+    Atomically create a fresh run folder and return (run id, path)
+    mkdir fails if the folder exists, so two requests can never share one
+    """
+    root = Path(root)
+    root.mkdir(parents=True, exist_ok=True)
+    while True:
+        run_id = uuid.uuid4().hex
+        path = root / run_id
+        try:
+            path.mkdir()
+            return run_id, path
+        except FileExistsError:
+            continue
+
+
+def _folder_size(path):
+    total = 0
+    for dirpath, _, files in os.walk(path):
+        for f in files:
+            try:
+                total += os.path.getsize(os.path.join(dirpath, f))
+            except OSError:
+                pass
+    return total
+
+
+def cleanup_workspaces(root, max_age=MAX_AGE_SECONDS, max_total_bytes=MAX_TOTAL_BYTES, keep=(), busy=None):
+    """
+    Delete run folders older than max_age, then the oldest ones until the
+    rest fit in max_total_bytes. Ids in keep, and folders busy(path) says
+    are in use, are never touched (nor counted): with several worker
+    processes, busy should check the files on disk, not this process's jobs
+    Returns the ids that were removed
+    """
+    root = Path(root)
+    if not root.exists():
+        return []
+
+    now = time.time()
+    runs = []
+    for path in root.iterdir():
+        if not path.is_dir() or path.name in keep or path.name.endswith(".deleting"):
+            continue
+        if busy is not None and busy(path):
+            continue
+        try:
+            mtime = path.stat().st_mtime
+        except OSError:
+            continue
+        runs.append((mtime, path))
+    runs.sort()
+
+    removed = []
+    sizes = {path: _folder_size(path) for _, path in runs}
+    total = sum(sizes.values())
+    for mtime, path in runs:
+        if now - mtime <= max_age and total <= max_total_bytes:
+            continue
+        # Rename first so readers never see a half-deleted run
+        trash = path.with_name(path.name + ".deleting")
+        try:
+            os.replace(path, trash)
+        except OSError:
+            continue
+        shutil.rmtree(trash, ignore_errors=True)
+        total -= sizes[path]
+        removed.append(path.name)
+    return removed